@@ -7,61 +7,123 @@ User can choose which data source to use for analysis.
 """
 
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import os
+import argparse
 import re
+import time
+import bisect
 import difflib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
-import comtradeapicall
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-import seaborn as sns
-
-# Monkey-patch pandas concat to be future-proof by cleaning dataframes before concatenation
-_original_concat = pd.concat
-
-def _future_proof_concat(objs, *args, **kwargs):
-    """
-    Future-proof wrapper for pandas concat that removes all-NA columns before concatenation.
-    This prevents FutureWarning about empty/all-NA entries in concat operations.
-    """
-    if objs is not None:
-        # Clean each dataframe by removing all-NA columns
-        cleaned_objs = []
-        for obj in objs:
-            if isinstance(obj, pd.DataFrame) and not obj.empty:
-                # Remove columns that are entirely NA
-                cleaned_obj = obj.dropna(axis=1, how='all')
-                cleaned_objs.append(cleaned_obj)
-            else:
-                cleaned_objs.append(obj)
 
-        # Only proceed if we have non-empty dataframes
-        if cleaned_objs:
-            return _original_concat(cleaned_objs, *args, **kwargs)
 
-    # Fallback to original if no valid objects
-    return _original_concat(objs, *args, **kwargs)
+# Patterns used to build filenames and clean product descriptions
+_RE_NONWORD = re.compile(r'[^\w\s-]')
+_RE_WS = re.compile(r'[\s]+')
+_RE_SUBCAT_PARENS = re.compile(r'\s*\(\d+\s+subcategor(y|ies)\)')
+_RE_PRODUCT_CODE_PREFIX = re.compile(r'Product code:\s*')
+_RE_PRODUCT_CODE_SEARCH = re.compile(r'Product code:\s*(\w+)')
+
+
+# Chart tick formatters (thousands/millions, plus billions on the stacked chart's value axis)
+def _tick_thousands_millions(x, pos):
+    return f'{x/1e6:.1f}M' if x >= 1e6 else f'{x/1e3:.0f}K'
+
+
+def _tick_usd_thousands_millions(x, pos):
+    return f'${x/1e6:.1f}M' if x >= 1e6 else f'${x/1e3:.0f}K'
+
+
+def _tick_up_to_billions(x, pos):
+    return f'{x/1e9:.1f}B' if x >= 1e9 else _tick_thousands_millions(x, pos)
+
 
-# Apply the patch
-pd.concat = _future_proof_concat
+def _tick_usd_up_to_billions(x, pos):
+    return f'${x/1e9:.1f}B' if x >= 1e9 else _tick_usd_thousands_millions(x, pos)
+
+
+@dataclass
+class RunConfig:
+    """Analysis settings for a non-interactive run, using the same values the prompts accept"""
+    period: str
+    reporter: str
+    product: str
+    direction: str
+    frequency: str = 'A'
+    source: Optional[str] = None  # defaults to BACI for annual, COMTRADE for monthly
+    partner: str = 'all'
+    metric: Optional[str] = None  # defaults to V (BACI) or PV (COMTRADE)
 
 
 class TradeAnalyzer:
     """Trade data analyzer supporting BACI (1995-2024) and COMTRADE data sources"""
 
+    # BACI yearly file columns: t (year), i (exporter), j (importer), k (product), v (value), q (quantity)
+    # Declared explicitly so a year is never mis-inferred from its first block; codes fit in 32 bits
+    # and years in 16, while v and q stay float64 to keep full precision in the sums.
+    # k is read as text because the files can hold legacy non-numeric codes (e.g. 9999AA);
+    # read_baci_csv converts it to int32 and keeps those codes as text in k_code
+    BACI_COLUMN_TYPES = {
+        't': pa.int16(), 'i': pa.int32(), 'j': pa.int32(), 'k': pa.string(),
+        'v': pa.float64(), 'q': pa.float64(),
+    }
+
+    # COMTRADE metrics: (api_column, display_name, metric_type, shortcut)
+    COMTRADE_METRICS = [
+        ('primaryValue', 'Primary_Value_USD', 'value', 'PV'),
+        ('fobValue', 'FOB_Value_USD', 'value', 'FOB'),
+        ('cifValue', 'CIF_Value_USD', 'value', 'CIF'),
+        ('qty', 'Quantity', 'quantity', 'QTY'),
+        ('netWgt', 'Net_Weight_Kg', 'weight', 'NW'),
+        ('grossWgt', 'Gross_Weight_Kg', 'weight', 'GW'),
+    ]
+
+    # Output files are written through a 1 MiB buffer instead of the default 8 KiB
+    EXPORT_BUFFER_SIZE = 1 << 20
+
+    # Metric columns that can appear in the combined data, BACI first, then COMTRADE
+    METRIC_COLUMNS = ['Trade_Value_USD', 'Quantity_MT', 'Primary_Value_USD', 'FOB_Value_USD', 'CIF_Value_USD',
+                      'Quantity', 'Net_Weight_Kg', 'Gross_Weight_Kg', 'Metric_Value']
+
     def __init__(self):
         self.base_dir = Path(__file__).parent
 
+        # Charts and exports all go here; created once rather than before every write
+        self.output_dir = self.base_dir / "output"
+        self.output_dir.mkdir(exist_ok=True)
+
         # BACI setup
         self.baci_dir = self.base_dir / "data" / "BACI" / "BACI_HS92_V202601"
         self.baci_country_codes = None
         self.baci_product_codes = None
 
+        # Lookup indexes built once from the reference tables
+        self._baci_country_by_code = {}
+        self._baci_country_entries = []
+        self._baci_names_lower = np.array([], dtype=str)
+        self._baci_country_names = frozenset()
+        self._baci_desc_by_code = {}
+        self._baci_products_sorted = None
+        self._clean_desc_cache = {}  # product_desc -> cleaned description for chart titles
+        self._file_tags_cache = {}  # (reporter, product, flow, metric type, partner) -> filename parts
+        self._chart_fig = None  # one off-screen figure, cleared and reused for every chart
+        self._baci_sorted_codes = []
+
         # COMTRADE setup
         self.subscription_key = self.load_subscription_key()
-        self.comtrade_reporter_cache = None
-        self.comtrade_partner_cache = None
+        self.comtrade_reference_dir = Path.home() / ".cache" / "trade_analyzer"
+        self.comtrade_reference_ttl = 7 * 24 * 3600  # seconds
+        self.comtrade_caches = {}  # role ('reporter'/'partner') -> reference table
+        self._comtrade_indexes = {}  # role -> lookup structures built from the reference table
 
         # Load reference data
         self.load_baci_reference_data()
@@ -90,13 +152,55 @@ class TradeAnalyzer:
     def load_baci_reference_data(self):
         """Load BACI country and product code mappings"""
         try:
-            self.baci_country_codes = pd.read_csv(self.baci_dir / "country_codes_V202601.csv")
-            self.baci_product_codes = pd.read_csv(self.baci_dir / "product_codes_HS92_V202601.csv")
+            cache_dir = self.baci_dir / "_cache"
+
+            self.baci_country_codes = self.load_cached_reference(
+                self.baci_dir / "country_codes_V202601.csv",
+                cache_dir / "country_codes.feather",
+                dtype={"country_code": "int32", "country_name": "string[pyarrow]"}
+            )
+
+            # Reference file stores codes as 6-digit strings with leading zeros (e.g., "010210")
+            self.baci_product_codes = self.load_cached_reference(
+                self.baci_dir / "product_codes_HS92_V202601.csv",
+                cache_dir / "product_codes.feather",
+                dtype={"code": "string[pyarrow]", "description": "string[pyarrow]"}
+            )
+
+            self._baci_country_by_code = dict(zip(self.baci_country_codes['country_code'],
+                                                  self.baci_country_codes['country_name']))
+            self._baci_country_entries = list(zip(self.baci_country_codes['country_code'].tolist(),
+                                                  self.baci_country_codes['country_name'].tolist()))
+            self._baci_names_lower = self.baci_country_codes['country_name'].fillna('').str.lower().to_numpy(dtype=str)
+            self._baci_country_names = frozenset(self.baci_country_codes['country_name'].dropna().unique())
+            # Description by 6-digit code, the key every product lookup pads to
+            self._baci_desc_by_code = dict(zip(self.baci_product_codes['code'].str.zfill(6),
+                                               self.baci_product_codes['description']))
+
+            # Product codes sorted so that an HS prefix maps to a contiguous range
+            self._baci_products_sorted = self.baci_product_codes.sort_values('code', kind='stable')
+            self._baci_sorted_codes = self._baci_products_sorted['code'].tolist()
             print("✓ BACI reference data loaded\n")
         except Exception as e:
             print(f"⚠ Warning: Could not load BACI reference data: {e}")
             print("  BACI data will not be available\n")
 
+    def load_cached_reference(self, csv_path, cache_path, dtype):
+        """Load a reference CSV via a Feather cache, rebuilding the cache when the CSV is newer"""
+        if cache_path.exists() and cache_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            # Feather keeps the string dtype but not its Arrow storage, so re-apply the dtypes
+            return pd.read_feather(cache_path, columns=list(dtype)).astype(dtype)
+
+        reference = pd.read_csv(csv_path, dtype=dtype, engine='pyarrow')
+
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            reference.to_feather(cache_path)
+        except OSError as e:
+            print(f"⚠ Warning: Could not write reference cache {cache_path.name}: {e}")
+
+        return reference
+
     def get_frequency_input(self):
         """Get frequency (Annual or Monthly) from user"""
         while True:
@@ -109,13 +213,19 @@ class TradeAnalyzer:
             print("  A  or  Annual   :  Yearly data")
             print("  M  or  Monthly  :  Monthly data (COMTRADE only)")
             print("")
-            freq = input("Enter frequency: ").strip().upper()
-            if freq in ['A', 'ANNUAL']:
-                return 'A'
-            elif freq in ['M', 'MONTHLY']:
-                return 'M'
-            else:
-                print("✗ Invalid input. Please enter A (Annual) or M (Monthly).")
+            ok, result = self.validate_frequency(input("Enter frequency: "))
+            if ok:
+                return result
+            print(result)
+
+    def validate_frequency(self, value):
+        """Validate a frequency choice, returns (True, 'A'/'M') or (False, error message)"""
+        freq = value.strip().upper()
+        if freq in ['A', 'ANNUAL']:
+            return True, 'A'
+        elif freq in ['M', 'MONTHLY']:
+            return True, 'M'
+        return False, "✗ Invalid input. Please enter A (Annual) or M (Monthly)."
 
     def get_data_source_input(self, freq_code):
         """Get data source selection from user"""
@@ -145,15 +255,22 @@ class TradeAnalyzer:
             print("  discrepancies between exporter and importer reports are harmonized.")
             print("  COMTRADE provides data as reported by individual countries.")
             print("")
-            source = input("Enter data source: ").strip().upper()
-            if source in ['B', 'BACI']:
-                self.selected_source = 'BACI'
-                return 'BACI'
-            elif source in ['C', 'COMTRADE']:
-                self.selected_source = 'COMTRADE'
-                return 'COMTRADE'
-            else:
-                print("✗ Invalid input. Please enter B (BACI) or C (COMTRADE).")
+            ok, result = self.validate_data_source(input("Enter data source: "), freq_code)
+            if ok:
+                self.selected_source = result
+                return result
+            print(result)
+
+    def validate_data_source(self, value, freq_code):
+        """Validate a data source choice, returns (True, 'BACI'/'COMTRADE') or (False, error message)"""
+        source = value.strip().upper()
+        if source in ['B', 'BACI']:
+            if freq_code == 'M':
+                return False, "✗ Error: Monthly data is only available via COMTRADE API."
+            return True, 'BACI'
+        elif source in ['C', 'COMTRADE']:
+            return True, 'COMTRADE'
+        return False, "✗ Invalid input. Please enter B (BACI) or C (COMTRADE)."
 
     def get_period_input(self, freq_code, data_source):
         """Get and validate period input from user"""
@@ -171,52 +288,12 @@ class TradeAnalyzer:
                 print("")
                 if data_source == 'BACI':
                     print("VALID RANGE: 1995-2024 (BACI database)")
-                    min_year, max_year = 1995, 2024
                 else:
-                    import datetime
-                    current_year = datetime.datetime.now().year
                     print(f"VALID RANGE: 1962-Present (COMTRADE API)")
                     print("NOTE: Data availability depends on reporting by the selected country.")
-                    min_year, max_year = 1962, current_year + 1
                 print("")
                 period_input = input("Enter year(s): ").strip()
 
-                # Parse period
-                if '-' in period_input and not period_input.startswith('-'):
-                    try:
-                        parts = period_input.split('-')
-                        if len(parts) != 2:
-                            print("✗ Error: Period format should be 'YYYY-YYYY'")
-                            continue
-
-                        start_year = int(parts[0].strip())
-                        end_year = int(parts[1].strip())
-
-                        if start_year > end_year:
-                            print("✗ Error: Start year must be less than or equal to end year.")
-                            continue
-
-                        if not (min_year <= start_year <= max_year and min_year <= end_year <= max_year):
-                            print(f"✗ Error: Years must be between {min_year} and {max_year}.")
-                            continue
-
-                        years = [str(y) for y in range(start_year, end_year + 1)]
-                        period_string = ','.join(years)
-                        print(f"✓ Period: {start_year}-{end_year} ({len(years)} years)")
-                        return period_string
-
-                    except ValueError:
-                        print("✗ Error: Please enter valid years")
-                else:
-                    try:
-                        year = int(period_input.strip())
-                        if not (min_year <= year <= max_year):
-                            print(f"✗ Error: Year must be between {min_year} and {max_year}.")
-                            continue
-                        return period_input
-                    except ValueError:
-                        print("✗ Error: Please enter a valid year.")
-
             else:  # Monthly - COMTRADE only
                 print("Enter the month or range for analysis.")
                 print("")
@@ -228,66 +305,211 @@ class TradeAnalyzer:
                 print("")
                 period_input = input("Enter period(s): ").strip()
 
-                if '-' in period_input and len(period_input.split('-')[0].strip()) == 6:
-                    try:
-                        parts = period_input.split('-')
-                        start_period = parts[0].strip()
-                        end_period = parts[1].strip()
+            ok, result = self.validate_period(period_input, freq_code, data_source)
+            if not ok:
+                print(result)
+                continue
 
-                        if len(start_period) != 6 or len(end_period) != 6:
-                            print("✗ Error: Period must be 6 digits (YYYYMM)")
-                            continue
+            period_string, summary = result
+            if summary:
+                print(summary)
+            return period_string
 
-                        start_year = int(start_period[:4])
-                        start_month = int(start_period[4:6])
-                        end_year = int(end_period[:4])
-                        end_month = int(end_period[4:6])
+    def get_year_bounds(self, data_source):
+        """Get the (min_year, max_year) available from a data source"""
+        if data_source == 'BACI':
+            return 1995, 2024
+        import datetime
+        return 1962, datetime.datetime.now().year + 1
 
-                        if not (1 <= start_month <= 12 and 1 <= end_month <= 12):
-                            print("✗ Error: Month must be between 01 and 12")
-                            continue
+    def validate_period(self, period_input, freq_code, data_source):
+        """Validate a period or range, returns (True, (period_string, summary)) or (False, error message)
 
-                        periods = []
-                        current_year = start_year
-                        current_month = start_month
+        period_string is the comma-separated list of periods expected by the loaders,
+        summary is a confirmation line for ranges (None for a single period).
+        """
+        period_input = period_input.strip()
 
-                        while (current_year < end_year) or (current_year == end_year and current_month <= end_month):
-                            periods.append(f"{current_year}{current_month:02d}")
-                            current_month += 1
-                            if current_month > 12:
-                                current_month = 1
-                                current_year += 1
+        if freq_code == 'A':
+            min_year, max_year = self.get_year_bounds(data_source)
 
-                        period_string = ','.join(periods)
-                        print(f"✓ Period: {start_period}-{end_period} ({len(periods)} months)")
-                        return period_string
+            # Parse period
+            if '-' in period_input and not period_input.startswith('-'):
+                try:
+                    parts = period_input.split('-')
+                    if len(parts) != 2:
+                        return False, "✗ Error: Period format should be 'YYYY-YYYY'"
 
-                    except ValueError:
-                        print("✗ Error: Please enter valid periods")
-                else:
-                    try:
-                        period = period_input.strip()
-                        if len(period) != 6:
-                            print("✗ Error: Monthly period must be 6 digits (YYYYMM)")
-                            continue
-                        year = int(period[:4])
-                        month = int(period[4:6])
-                        if not (1 <= month <= 12):
-                            print("✗ Error: Month must be between 01 and 12")
-                            continue
-                        return period_input
-                    except ValueError:
-                        print("✗ Error: Please enter valid period in YYYYMM format")
+                    start_year = int(parts[0].strip())
+                    end_year = int(parts[1].strip())
+
+                    if start_year > end_year:
+                        return False, "✗ Error: Start year must be less than or equal to end year."
+
+                    if not (min_year <= start_year <= max_year and min_year <= end_year <= max_year):
+                        return False, f"✗ Error: Years must be between {min_year} and {max_year}."
+
+                    years = np.arange(start_year, end_year + 1).astype(str)
+                    period_string = ','.join(years)
+                    return True, (period_string, f"✓ Period: {start_year}-{end_year} ({len(years)} years)")
+
+                except ValueError:
+                    return False, "✗ Error: Please enter valid years"
+            else:
+                try:
+                    year = int(period_input)
+                except ValueError:
+                    return False, "✗ Error: Please enter a valid year."
+                if not (min_year <= year <= max_year):
+                    return False, f"✗ Error: Year must be between {min_year} and {max_year}."
+                return True, (period_input, None)
+
+        # Monthly - COMTRADE only
+        if '-' in period_input and len(period_input.split('-')[0].strip()) == 6:
+            try:
+                parts = period_input.split('-')
+                start_period = parts[0].strip()
+                end_period = parts[1].strip()
+
+                if len(start_period) != 6 or len(end_period) != 6:
+                    return False, "✗ Error: Period must be 6 digits (YYYYMM)"
+
+                start_year = int(start_period[:4])
+                start_month = int(start_period[4:6])
+                end_year = int(end_period[:4])
+                end_month = int(end_period[4:6])
+
+                if not (1 <= start_month <= 12 and 1 <= end_month <= 12):
+                    return False, "✗ Error: Month must be between 01 and 12"
+
+                if (start_year, start_month) > (end_year, end_month):
+                    return False, "✗ Error: Start period must be before or equal to end period."
+
+                periods = pd.period_range(
+                    start=pd.Period(year=start_year, month=start_month, freq='M'),
+                    end=pd.Period(year=end_year, month=end_month, freq='M'),
+                    freq='M'
+                ).strftime('%Y%m').tolist()
+
+                period_string = ','.join(periods)
+                return True, (period_string, f"✓ Period: {start_period}-{end_period} ({len(periods)} months)")
+
+            except ValueError:
+                return False, "✗ Error: Please enter valid periods"
+        else:
+            try:
+                if len(period_input) != 6:
+                    return False, "✗ Error: Monthly period must be 6 digits (YYYYMM)"
+                year = int(period_input[:4])
+                month = int(period_input[4:6])
+                if not (1 <= month <= 12):
+                    return False, "✗ Error: Month must be between 01 and 12"
+                return True, (period_input, None)
+            except ValueError:
+                return False, "✗ Error: Please enter valid period in YYYYMM format"
+
+    def load_comtrade_reference(self, category):
+        """Load a COMTRADE reference table, reusing a local Feather copy while it is fresh"""
+        cache_path = self.comtrade_reference_dir / f"{category}.feather"
+        if cache_path.exists() and time.time() - cache_path.stat().st_mtime < self.comtrade_reference_ttl:
+            try:
+                return pd.read_feather(cache_path)
+            except Exception as e:
+                # Truncated or corrupt copy: drop it and fetch the table again
+                print(f"⚠ Warning: Could not read cached COMTRADE {category} reference data ({e}), refetching")
+                try:
+                    cache_path.unlink(missing_ok=True)
+                except OSError:
+                    pass
+
+        import comtradeapicall
+
+        print(f"\nLoading COMTRADE {category} reference data...")
+        reference = comtradeapicall.getReference(category)
+
+        if reference is None:
+            print(f"⚠ Warning: COMTRADE {category} reference data unavailable, using BACI country names only")
+        else:
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                reference.to_feather(cache_path)
+            except Exception as e:
+                print(f"⚠ Warning: Could not cache COMTRADE {category} reference data: {e}")
+
+        return reference
+
+    def index_comtrade_reference(self, reference):
+        """Build lookup structures for a COMTRADE reference table (empty ones when it is unavailable)"""
+        if reference is None:
+            return {
+                'by_id': {},
+                'entries': [],
+                'names_lower': np.array([], dtype=str),
+                'suggestions': sorted(self._baci_country_names),
+            }
+        return {
+            'by_id': dict(zip(reference['id'], reference['text'])),
+            'entries': list(zip(reference['id'].tolist(), reference['text'].tolist())),
+            'names_lower': reference['text'].fillna('').str.lower().to_numpy(dtype=str),
+            # Deduplicated name universe for fuzzy-match suggestions
+            'suggestions': sorted(self._baci_country_names.union(reference['text'].dropna().unique())),
+        }
+
+    def get_comtrade_index(self, role):
+        """Get COMTRADE lookup structures for a role, loading the reference table on first use"""
+        if role not in self._comtrade_indexes:
+            self.comtrade_caches[role] = self.load_comtrade_reference(role)
+            self._comtrade_indexes[role] = self.index_comtrade_reference(self.comtrade_caches[role])
+        return self._comtrade_indexes[role]
+
+    def find_country_by_code(self, country_code, role):
+        """Look up a numeric country code, returns (comtrade_name, baci_name) - None where not found"""
+        comtrade_name = self.get_comtrade_index(role)['by_id'].get(country_code)
+        baci_name = self._baci_country_by_code.get(country_code)
+        return comtrade_name, baci_name
+
+    def find_country_by_text(self, text, role):
+        """Case-insensitive substring search, returns lists of (code, name) from COMTRADE and BACI"""
+        comtrade_index = self.get_comtrade_index(role)
+        needle = text.lower()
+        comtrade_matches = [comtrade_index['entries'][i]
+                            for i in np.flatnonzero(np.char.find(comtrade_index['names_lower'], needle) >= 0)]
+        baci_matches = [self._baci_country_entries[i]
+                        for i in np.flatnonzero(np.char.find(self._baci_names_lower, needle) >= 0)]
+        return comtrade_matches, baci_matches
+
+    def validate_country(self, value, role):
+        """Resolve a country name or code without prompting, returns (True, (code, name, baci_code)) or (False, error message)
+
+        Text must match a single COMTRADE country; ambiguous names are rejected rather than
+        offered as a choice, so scripted runs never block on input.
+        """
+        country_input = str(value).strip()
+
+        if role == "partner" and country_input.lower() in ['0', 'world', 'all']:
+            return True, ('0', 'World', 0)
+
+        try:
+            country_code = int(country_input)
+        except ValueError:
+            comtrade_matches, baci_matches = self.find_country_by_text(country_input, role)
+            if len(comtrade_matches) == 1 and len(baci_matches) <= 1:
+                comtrade_code, comtrade_name = comtrade_matches[0]
+                baci_code = baci_matches[0][0] if baci_matches else None
+                return True, (str(comtrade_code), comtrade_name, baci_code)
+            if not comtrade_matches and not baci_matches:
+                return False, f"✗ Error: No country found matching '{country_input}'"
+            return False, f"✗ Error: Multiple countries found matching '{country_input}', please use the country code."
+
+        comtrade_name, baci_name = self.find_country_by_code(country_code, role)
+        if not (comtrade_name or baci_name):
+            return False, f"✗ Country code {country_code} not found in either database."
+        return True, (str(country_code), comtrade_name or baci_name, country_code if baci_name else None)
 
     def get_country_input(self, role="reporter"):
         """Get and validate country input - checks both BACI and COMTRADE"""
-        # Load COMTRADE cache if needed
-        if self.comtrade_reporter_cache is None:
-            print(f"\nLoading COMTRADE {role} reference data...")
-            self.comtrade_reporter_cache = comtradeapicall.getReference('reporter')
-            self.comtrade_partner_cache = comtradeapicall.getReference('partner')
-
-        comtrade_cache = self.comtrade_reporter_cache if role == "reporter" else self.comtrade_partner_cache
+        # Load COMTRADE reference data for this role if needed
+        self.get_comtrade_index(role)
 
         while True:
             print("\n" + "="*60)
@@ -315,13 +537,8 @@ class TradeAnalyzer:
             try:
                 country_code = int(country_input)
 
-                # Check COMTRADE
-                comtrade_match = comtrade_cache[comtrade_cache['id'] == country_code]
-                comtrade_name = comtrade_match.iloc[0]['text'] if not comtrade_match.empty else None
-
-                # Check BACI
-                baci_match = self.baci_country_codes[self.baci_country_codes['country_code'] == country_code]
-                baci_name = baci_match.iloc[0]['country_name'] if not baci_match.empty else None
+                # Check COMTRADE and BACI
+                comtrade_name, baci_name = self.find_country_by_code(country_code, role)
 
                 if comtrade_name or baci_name:
                     # Show both if different
@@ -343,26 +560,19 @@ class TradeAnalyzer:
                     confirm = input("Confirm selection (Y/N): ").strip().upper()
                     if confirm in ['Y', 'YES']:
                         final_name = comtrade_name or baci_name
-                        baci_code = baci_match.iloc[0]['country_code'] if not baci_match.empty else None
+                        baci_code = country_code if baci_name else None
                         return str(country_code), final_name, baci_code
                 else:
                     print(f"✗ Country code {country_code} not found in either database.")
 
             except ValueError:
                 # Search by text
-                comtrade_matches = comtrade_cache[
-                    comtrade_cache['text'].str.contains(country_input, case=False, na=False)
-                ]
-
-                baci_matches = self.baci_country_codes[
-                    self.baci_country_codes['country_name'].str.contains(country_input, case=False, na=False)
-                ]
+                comtrade_matches, baci_matches = self.find_country_by_text(country_input, role)
 
                 if len(comtrade_matches) == 1 and len(baci_matches) <= 1:
-                    comtrade_code = str(comtrade_matches.iloc[0]['id'])
-                    comtrade_name = comtrade_matches.iloc[0]['text']
-                    baci_code = baci_matches.iloc[0]['country_code'] if not baci_matches.empty else None
-                    baci_name = baci_matches.iloc[0]['country_name'] if not baci_matches.empty else None
+                    comtrade_code, comtrade_name = comtrade_matches[0]
+                    comtrade_code = str(comtrade_code)
+                    baci_code, baci_name = baci_matches[0] if baci_matches else (None, None)
 
                     if baci_name and comtrade_name.lower() != baci_name.lower():
                         print(f"✓ Country found:")
@@ -379,12 +589,8 @@ class TradeAnalyzer:
                     print(f"✗ Error: No country found matching '{country_input}'")
 
                     # Try fuzzy matching to suggest similar country names
-                    all_country_names = list(comtrade_cache['text'].dropna().unique())
-                    if self.baci_country_codes is not None:
-                        all_country_names.extend(list(self.baci_country_codes['country_name'].dropna().unique()))
-                    all_country_names = list(set(all_country_names))  # Remove duplicates
-
-                    similar = difflib.get_close_matches(country_input, all_country_names, n=5, cutoff=0.6)
+                    suggestion_names = self.get_comtrade_index(role)['suggestions']
+                    similar = difflib.get_close_matches(country_input, suggestion_names, n=5, cutoff=0.6)
                     if similar:
                         print(f"\nDid you mean one of these?")
                         for suggestion in similar:
@@ -392,22 +598,65 @@ class TradeAnalyzer:
                         print("")
                 else:
                     print(f"Multiple countries found matching '{country_input}':")
-                    # Combine matches from both sources, filtering out empty dataframes
-                    matches_list = []
-                    if len(comtrade_matches) > 0:
-                        matches_list.append(comtrade_matches[['id', 'text']].rename(columns={'id': 'code', 'text': 'name'}))
-                    if len(baci_matches) > 0:
-                        matches_list.append(baci_matches[['country_code', 'country_name']].rename(columns={'country_code': 'code', 'country_name': 'name'}))
-
-                    if len(matches_list) == 1:
-                        all_matches = matches_list[0].drop_duplicates()
-                    else:
-                        all_matches = pd.concat(matches_list).drop_duplicates()
+                    # Combine matches from both sources, dropping duplicates but keeping order
+                    all_matches = list(dict.fromkeys(comtrade_matches + baci_matches))
 
-                    for idx, row in all_matches.head(10).iterrows():
-                        print(f"  {row['code']}: {row['name']}")
+                    for code, name in all_matches[:10]:
+                        print(f"  {code}: {name}")
                     print("\nPlease enter a more specific name or use the country code.")
 
+    def hs_code_prefix(self, product_code):
+        """Normalize an HS code to its 2/4/6-digit form with leading zeros, or None if not an HS code
+
+        BACI stores codes as integers, so a 5-digit code like 10210 is HS 010210;
+        odd-length input is taken to have lost its leading zero.
+        """
+        code = str(product_code).strip()
+        if len(code) % 2:
+            code = '0' + code
+        if not (code.isascii() and code.isdigit()) or len(code) > 6:
+            return None
+        return code
+
+    def lookup_product(self, product_input):
+        """Look up a product code in the BACI reference, returns (description or None, subcategories)"""
+        # Reference file has 6-digit codes with leading zeros (e.g., "010210")
+        # User might enter with or without leading zeros
+        prefix = self.hs_code_prefix(product_input)
+        if prefix is None:
+            return None, self._baci_products_sorted.iloc[0:0]
+
+        # Check for exact match
+        baci_desc = self._baci_desc_by_code.get(prefix)
+
+        # Check for subcategories (codes that start with input pattern)
+        # Binary search the sorted codes for the prefix range;
+        # bisect_right skips the exact match, which sorts first within the range
+        lo = bisect.bisect_right(self._baci_sorted_codes, prefix)
+        hi = bisect.bisect_left(self._baci_sorted_codes, prefix + '~')
+        subcategories = self._baci_products_sorted.iloc[lo:hi].sort_index()
+
+        return baci_desc, subcategories
+
+    def validate_product(self, value):
+        """Resolve a product code without prompting, returns (True, (code, description)) or (False, error message)"""
+        product_input = str(value).strip().upper()
+
+        if not product_input:
+            return False, "✗ Error: Product code cannot be empty"
+
+        if product_input in ['TOTAL', 'AG2', 'AG4', 'AG6']:
+            return True, (product_input, f"{product_input} - All products at specified level")
+
+        if self.baci_product_codes is None:
+            return True, (product_input, f"Product code: {product_input}")
+
+        baci_desc, subcategories = self.lookup_product(product_input)
+        if not subcategories.empty:
+            main_desc = f"{product_input} - {baci_desc if baci_desc else 'All subcategories'} ({len(subcategories)} subcategories)"
+            return True, (product_input, main_desc)
+        return True, (product_input, baci_desc or f"Product code: {product_input}")
+
     def get_product_input(self):
         """Get and validate product code input with subcategory details"""
         while True:
@@ -445,37 +694,15 @@ class TradeAnalyzer:
 
             if self.baci_product_codes is not None:
                 try:
-                    # Normalize product code for comparison
-                    # Reference file has 6-digit codes with leading zeros (e.g., "010210")
-                    # User might enter with or without leading zeros
-                    product_input_clean = product_input.lstrip('0') or '0'  # Remove leading zeros for comparison
-
-                    # Create normalized code column for matching (strip leading zeros from reference)
-                    ref_codes = self.baci_product_codes.copy()
-                    ref_codes['code_normalized'] = ref_codes['code'].astype(str).str.lstrip('0')
-                    ref_codes['code_normalized'] = ref_codes['code_normalized'].replace('', '0')
-
-                    # Check for exact match
-                    exact_match = ref_codes[ref_codes['code_normalized'] == product_input_clean]
-
-                    if not exact_match.empty:
-                        baci_desc = exact_match.iloc[0]['description']
-
-                    # Check for subcategories (codes that start with input pattern)
-                    # Use the original code column for prefix matching
-                    input_len = len(product_input_clean)
-                    subcategories = ref_codes[
-                        (ref_codes['code_normalized'].str[:input_len] == product_input_clean) &
-                        (ref_codes['code_normalized'].str.len() > input_len)
-                    ]
+                    baci_desc, subcategories = self.lookup_product(product_input)
 
                     if not subcategories.empty:
                         # Found subcategories
                         print(f"\n⚠ Product code '{product_input}' has {len(subcategories)} subcategories:")
                         print("="*60)
-                        for idx, row in subcategories.head(20).iterrows():
-                            desc_short = row['description'][:60] if len(row['description']) > 60 else row['description']
-                            print(f"  {row['code']}: {desc_short}")
+                        shown = subcategories.head(20)
+                        for code, desc_short in zip(shown['code'], shown['description'].str.slice(0, 60)):
+                            print(f"  {code}: {desc_short}")
                         if len(subcategories) > 20:
                             print(f"  ... and {len(subcategories) - 20} more")
                         print("="*60)
@@ -530,13 +757,19 @@ class TradeAnalyzer:
             print("  M  or  Imports  :  Goods imported by the reporter country")
             print("  X  or  Exports  :  Goods exported by the reporter country")
             print("")
-            direction = input("Enter trade direction: ").strip().upper()
-            if direction in ['M', 'IMPORTS', 'IMPORT']:
-                return 'M', 'Imports'
-            elif direction in ['X', 'EXPORTS', 'EXPORT']:
-                return 'X', 'Exports'
-            else:
-                print("✗ Invalid input. Please enter M (Imports) or X (Exports).")
+            ok, result = self.validate_trade_direction(input("Enter trade direction: "))
+            if ok:
+                return result
+            print(result)
+
+    def validate_trade_direction(self, value):
+        """Validate a trade direction, returns (True, (flow_code, flow_desc)) or (False, error message)"""
+        direction = value.strip().upper()
+        if direction in ['M', 'IMPORTS', 'IMPORT']:
+            return True, ('M', 'Imports')
+        elif direction in ['X', 'EXPORTS', 'EXPORT']:
+            return True, ('X', 'Exports')
+        return False, "✗ Invalid input. Please enter M (Imports) or X (Exports)."
 
     def get_partner_choice(self):
         """Get partner analysis choice from user"""
@@ -577,16 +810,29 @@ class TradeAnalyzer:
             print("WARNING: Quantity data may be less reliable than Value data.")
             print("         Reporting practices vary by country and product.")
             print("")
-            choice = input("Enter metric: ").strip().upper()
-            if choice in ['V', 'VALUE']:
-                return 'Trade_Value_USD', 'value', 'v'
-            elif choice in ['Q', 'QUANTITY']:
-                return 'Quantity_MT', 'quantity', 'q'
-            else:
-                print("✗ Invalid input. Please enter V (Value) or Q (Quantity).")
+            ok, result = self.validate_metric_baci(input("Enter metric: "))
+            if ok:
+                return result
+            print(result)
+
+    def validate_metric_baci(self, value):
+        """Validate a BACI metric choice, returns (True, (metric_name, metric_type, metric_col)) or (False, error message)"""
+        choice = value.strip().upper()
+        if choice in ['V', 'VALUE']:
+            return True, ('Trade_Value_USD', 'value', 'v')
+        elif choice in ['Q', 'QUANTITY']:
+            return True, ('Quantity_MT', 'quantity', 'q')
+        return False, "✗ Invalid input. Please enter V (Value) or Q (Quantity)."
 
     def get_metric_choice_comtrade(self, available_metrics):
         """Get metric choice for COMTRADE data based on actual available metrics"""
+        # Options don't change between retries, so format the menu lines once
+        metric_options = self.get_comtrade_metric_options(available_metrics)
+        option_lines = [
+            f"  {option_num}  or  {shortcut:4s}:  {display_name.replace('_', ' ')} ({available_metrics[api_col]:,} records)"
+            for option_num, (api_col, display_name, mtype, shortcut) in enumerate(metric_options, start=1)
+        ]
+
         while True:
             print("\n" + "="*60)
             print("METRIC SELECTION (COMTRADE)")
@@ -595,30 +841,8 @@ class TradeAnalyzer:
             print("")
             print("AVAILABLE METRICS FROM API RESPONSE:")
 
-            # Build list of available metrics with their codes and shortcuts
-            metric_options = []
-            shortcut_map = {}
-            option_num = 1
-
-            # Define metric info: (api_column, display_name, metric_type, shortcut)
-            metric_defs = [
-                ('primaryValue', 'Primary_Value_USD', 'value', 'PV'),
-                ('fobValue', 'FOB_Value_USD', 'value', 'FOB'),
-                ('cifValue', 'CIF_Value_USD', 'value', 'CIF'),
-                ('qty', 'Quantity', 'quantity', 'QTY'),
-                ('netWgt', 'Net_Weight_Kg', 'weight', 'NW'),
-                ('grossWgt', 'Gross_Weight_Kg', 'weight', 'GW'),
-            ]
-
-            for api_col, display_name, mtype, shortcut in metric_defs:
-                if api_col in available_metrics and available_metrics[api_col] > 0:
-                    unit = "USD" if mtype == 'value' else ("Kg" if mtype == 'weight' else "units")
-                    print(f"  {option_num}  or  {shortcut:4s}:  {display_name.replace('_', ' ')} ({available_metrics[api_col]:,} records)")
-                    metric_options.append((api_col, display_name, mtype, shortcut))
-                    # Map both number and shortcut to this option
-                    shortcut_map[str(option_num)] = (api_col, display_name, mtype)
-                    shortcut_map[shortcut] = (api_col, display_name, mtype)
-                    option_num += 1
+            for line in option_lines:
+                print(line)
 
             if not metric_options:
                 print("  ⚠ No metrics available in API response!")
@@ -631,19 +855,29 @@ class TradeAnalyzer:
             print("WARNING: Metrics other than Value (USD) may be less reliable.")
             print("         Reporting practices vary by country and product.")
             print("")
-            choice = input("Enter metric: ").strip().upper()
-
-            # Find selected metric
-            if choice in shortcut_map:
-                api_col, display_name, mtype = shortcut_map[choice]
-                return display_name, mtype, api_col
-            else:
-                print("✗ Invalid input. Please enter a valid metric number or code.")
+            ok, result = self.validate_metric_comtrade(input("Enter metric: "), available_metrics)
+            if ok:
+                return result
+            print(result)
+
+    def get_comtrade_metric_options(self, available_metrics):
+        """Get the COMTRADE metric definitions that have data in the API response"""
+        return [metric for metric in self.COMTRADE_METRICS
+                if metric[0] in available_metrics and available_metrics[metric[0]] > 0]
+
+    def validate_metric_comtrade(self, value, available_metrics):
+        """Validate a COMTRADE metric number or shortcut, returns (True, (display_name, metric_type, api_col)) or (False, error message)"""
+        choice = value.strip().upper()
+        metric_options = self.get_comtrade_metric_options(available_metrics)
+        for option_num, (api_col, display_name, mtype, shortcut) in enumerate(metric_options, start=1):
+            if choice in [str(option_num), shortcut]:
+                return True, (display_name, mtype, api_col)
+        return False, "✗ Invalid input. Please enter a valid metric number or code."
 
     def sanitize_filename(self, text, max_length=50):
         """Sanitize text for use in filename"""
-        sanitized = re.sub(r'[^\w\s-]', '', text)
-        sanitized = re.sub(r'[\s]+', '_', sanitized)
+        sanitized = _RE_NONWORD.sub('', text)
+        sanitized = _RE_WS.sub('_', sanitized)
         if len(sanitized) > max_length:
             sanitized = sanitized[:max_length].rstrip('_')
         return sanitized
@@ -669,14 +903,33 @@ class TradeAnalyzer:
                 return f"HS{code}"
 
         # Try to extract from "Product code: X" format
-        match = re.search(r'Product code:\s*(\w+)', product_desc)
+        match = _RE_PRODUCT_CODE_SEARCH.search(product_desc)
         if match:
             return f"HS{match.group(1)}"
 
         # Fallback: return first 10 chars sanitized
         return self.sanitize_filename(product_desc, max_length=10)
 
+    def get_file_tags(self, reporter_name, product_desc, flow_desc, metric_type, partner_name=None):
+        """Get the (reporter, flow, product code, metric, partner) filename parts, computing them once per distinct input"""
+        key = (reporter_name, product_desc, flow_desc, metric_type, partner_name)
+        if key not in self._file_tags_cache:
+            self._file_tags_cache[key] = (
+                self.sanitize_filename(reporter_name),
+                'imp' if flow_desc == 'Imports' else 'exp',
+                self.get_product_code_for_filename(product_desc),
+                'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt'),
+                self.sanitize_filename(partner_name) if partner_name else None,
+            )
+        return self._file_tags_cache[key]
+
     def get_clean_product_desc(self, product_desc):
+        """Get the clean product description for a product_desc, computing it once per distinct input"""
+        if product_desc not in self._clean_desc_cache:
+            self._clean_desc_cache[product_desc] = self.clean_product_desc(product_desc)
+        return self._clean_desc_cache[product_desc]
+
+    def clean_product_desc(self, product_desc):
         """Extract clean product description without code and subcategory info"""
         # Examples of inputs:
         # "10 - Cereals (227 subcategories)"
@@ -685,7 +938,7 @@ class TradeAnalyzer:
         # "Product code: 10"
 
         # Remove subcategory info in parentheses
-        desc = re.sub(r'\s*\(\d+\s+subcategor(y|ies)\)', '', product_desc)
+        desc = _RE_SUBCAT_PARENS.sub('', product_desc)
 
         # Extract description after dash if present
         if ' - ' in desc:
@@ -696,16 +949,11 @@ class TradeAnalyzer:
             # If description is generic, try to look up the actual product name
             if description in ['All subcategories', ''] or description.startswith('Product code'):
                 # Try to get description from BACI product codes
-                if hasattr(self, 'baci_product_codes') and self.baci_product_codes is not None:
-                    try:
-                        # Reference file stores codes as strings with leading zeros (e.g., "010210")
-                        # Pad the code to 6 digits for proper matching
-                        code_padded = str(code).zfill(6)
-                        match = self.baci_product_codes[self.baci_product_codes['code'].astype(str).str.zfill(6) == code_padded]
-                        if not match.empty:
-                            return match.iloc[0]['description']
-                    except:
-                        pass
+                # Reference file stores codes as strings with leading zeros (e.g., "010210")
+                # Pad the code to 6 digits for proper matching
+                baci_desc = self._baci_desc_by_code.get(str(code).zfill(6))
+                if baci_desc is not None:
+                    return baci_desc
 
                 # If lookup fails, use descriptive text
                 return f"Products with code starting with {code}"
@@ -713,27 +961,32 @@ class TradeAnalyzer:
             return description
 
         # Remove "Product code:" prefix if present
-        desc = re.sub(r'Product code:\s*', '', desc)
+        desc = _RE_PRODUCT_CODE_PREFIX.sub('', desc)
 
         return desc.strip()
 
     def load_baci_data(self, years, reporter_baci_code, product_code, flow_code, keep_subcategories=False):
-        """Load BACI data for specified years using chunked reading with filtering"""
+        """Load BACI data for specified years using an Arrow CSV scan with the filters pushed down"""
         if not years or reporter_baci_code is None:
             return None
 
+        # BACI stores product codes as integers (e.g., 10210 for HS code 010210),
+        # so a code that is not a 2-6 digit HS code cannot match any row
+        product_prefix = self.hs_code_prefix(product_code)
+        if product_prefix is None:
+            print(f"  ✗ Invalid product code for BACI: {product_code}")
+            return None
+
         print(f"\nLoading BACI data for {len(years)} year(s)...")
-        all_data = []
+        all_data = []  # one partially aggregated Arrow table per year
+        records_loaded = 0
 
         # Prepare product filter
-        # BACI stores product codes as integers (e.g., 10210 for HS code 010210)
-        # User may enter with or without leading zeros
-        # Normalize by removing leading zeros for consistent comparison
-        product_code_clean = str(product_code).lstrip('0') or '0'
-        try:
-            product_int = int(product_code_clean)
-        except:
-            product_int = None
+        # A 2/4/6-digit HS prefix covers a contiguous range of the integer codes:
+        # chapter 10 is 100000 <= k < 110000, heading 0102 is 10200 <= k < 10300
+        scale = 10 ** (6 - len(product_prefix))
+        k_lo = int(product_prefix) * scale
+        k_hi = (int(product_prefix) + 1) * scale
 
         # Determine which column to filter for country based on direction
         # BACI columns: t (year), i (exporter), j (importer), k (product), v (value), q (quantity)
@@ -744,102 +997,61 @@ class TradeAnalyzer:
             country_col = 'i'
             partner_col = 'j'
 
-        for year in years:
-            filename = f"BACI_HS92_Y{year}_V202601.csv"
-            filepath = self.baci_dir / filename
-
-            if not filepath.exists():
-                print(f"  ⚠ Warning: {filename} not found, skipping year {year}")
-                continue
-
-            print(f"  Loading {year}...", end=" ", flush=True)
-            try:
-                # Use chunked reading with filtering to avoid loading entire file into memory
-                chunk_size = 500000
-                year_data = []
-                records_loaded = 0
-
-                for chunk in pd.read_csv(filepath, chunksize=chunk_size):
-                    # Filter by country first (most restrictive)
-                    chunk_filtered = chunk[chunk[country_col] == reporter_baci_code]
-
-                    if len(chunk_filtered) == 0:
-                        continue
-
-                    # Filter by product (exact match or prefix match for subcategories)
-                    # BACI 'k' column is integer, so compare accordingly
-                    if product_int is not None:
-                        # For prefix matching: convert k to string (no leading zeros) and check prefix
-                        k_str = chunk_filtered['k'].astype(str)
-                        chunk_filtered = chunk_filtered[
-                            (chunk_filtered['k'] == product_int) |
-                            (k_str.str.startswith(product_code_clean))
-                        ]
-                    else:
-                        chunk_filtered = chunk_filtered[chunk_filtered['k'].astype(str) == product_code_clean]
-
-                    if len(chunk_filtered) > 0:
-                        year_data.append(chunk_filtered)
-                        records_loaded += len(chunk_filtered)
-
-                if year_data:
-                    combined_year = pd.concat(year_data, ignore_index=True)
-                    all_data.append(combined_year)
-                    print(f"✓ {records_loaded:,} records")
-                else:
-                    print(f"✓ 0 records (no matching data)")
-
-            except Exception as e:
-                print(f"✗ Error loading {year}: {e}")
-                continue
+        # Filter by country first (most restrictive), then by product (the code and all its subcategories)
+        # BACI 'k' column is integer once loaded; legacy non-numeric codes are null there and kept in
+        # k_code, matched by text prefix so they can be counted (they are left out of the sums)
+        row_filter = ((pc.field(country_col) == reporter_baci_code)
+                      & (((pc.field('k') >= k_lo) & (pc.field('k') < k_hi))
+                         | pc.starts_with(pc.field('k_code'), pattern=product_prefix)))
+
+        columns = ['t', country_col, partner_col, 'k', 'v', 'q']
+        group_cols = [partner_col, 'k', 't'] if keep_subcategories else [partner_col, 't']
+
+        # Years are independent scans and Arrow releases the GIL, so read them concurrently;
+        # statuses are printed in year order as results come back
+        with ThreadPoolExecutor(max_workers=min(len(years), os.cpu_count() or 1)) as executor:
+            results = executor.map(lambda year: self.load_baci_year(year, columns, row_filter, group_cols), years)
+            for year_partial, year_records, status in results:
+                print(status)
+                records_loaded += year_records
+                if year_partial is not None:
+                    all_data.append(year_partial)
 
         if not all_data:
             print("  ✗ No BACI data loaded")
             return None
 
-        # Combine all years
-        filtered = pd.concat(all_data, ignore_index=True)
-        print(f"  ✓ Total: {len(filtered):,} relevant records")
+        # Combine the per-year partial sums and convert to pandas once
+        partials = pa.concat_tables(all_data).to_pandas()
+        print(f"  ✓ Total: {records_loaded:,} relevant records")
+
+        # Group on categorical codes; observed=True keeps only the combinations that occur
+        code_cols = [partner_col, 'k'] if keep_subcategories else [partner_col]
+        partials[code_cols] = partials[code_cols].astype('category')
 
-        # Aggregate - with or without subcategories
+        # Combine the partials - with or without subcategories
         if keep_subcategories:
             # Keep product code for subcategory analysis
-            aggregated = filtered.groupby([partner_col, 'k', 't']).agg({
+            aggregated = partials.groupby([partner_col, 'k', 't'], observed=True).agg({
                 'v': 'sum',  # value in thousand USD
                 'q': 'sum'   # quantity in metric tons
             }).reset_index()
 
-            aggregated.columns = ['partner_code', 'product_code', 'year', 'value_thousand_usd', 'quantity_mt']
+            aggregated.columns = ['partner_code', 'product_code', 'year', 'value_usd', 'quantity_mt']
 
-            # Convert BACI value from thousand USD to USD
-            aggregated['value_usd'] = aggregated['value_thousand_usd'] * 1000
+            # Back to plain integer codes for the name lookups and downstream groupbys
+            aggregated[['partner_code', 'product_code']] = aggregated[['partner_code', 'product_code']].astype('int64')
+
+            # Convert BACI value from thousand USD to USD, in place
+            aggregated['value_usd'] *= 1000
 
             # Map partner codes to names
-            # Ensure data types match for merge - convert to int
-            country_codes_for_merge = self.baci_country_codes[['country_code', 'country_name']].copy()
-            country_codes_for_merge['country_code'] = pd.to_numeric(country_codes_for_merge['country_code'], errors='coerce').astype('Int64')
-
-            aggregated = aggregated.merge(
-                country_codes_for_merge,
-                left_on='partner_code',
-                right_on='country_code',
-                how='left'
-            )
+            aggregated['country_name'] = aggregated['partner_code'].map(self._baci_country_by_code)
 
             # Map product codes to descriptions
             # BACI data has integer codes (e.g., 10210), reference file has string codes with leading zeros (e.g., "010210")
-            # Normalize both by padding integers to 6 digits for proper matching
-            aggregated['product_code_padded'] = aggregated['product_code'].astype(str).str.zfill(6)
-            product_codes_for_merge = self.baci_product_codes[['code', 'description']].copy()
-            product_codes_for_merge['code'] = product_codes_for_merge['code'].astype(str).str.zfill(6)
-
-            aggregated = aggregated.merge(
-                product_codes_for_merge,
-                left_on='product_code_padded',
-                right_on='code',
-                how='left'
-            )
-            aggregated.drop(columns=['product_code_padded'], inplace=True)
+            # Normalize by padding integers to 6 digits for proper matching
+            aggregated['description'] = aggregated['product_code'].astype(str).str.zfill(6).map(self._baci_desc_by_code)
 
             # Clean up
             aggregated = aggregated[['partner_code', 'country_name', 'product_code', 'description', 'year', 'value_usd', 'quantity_mt']]
@@ -851,27 +1063,21 @@ class TradeAnalyzer:
 
         else:
             # Aggregate by partner and year only (no subcategories)
-            aggregated = filtered.groupby([partner_col, 't']).agg({
+            aggregated = partials.groupby([partner_col, 't'], observed=True).agg({
                 'v': 'sum',  # value in thousand USD
                 'q': 'sum'   # quantity in metric tons
             }).reset_index()
 
-            aggregated.columns = ['partner_code', 'year', 'value_thousand_usd', 'quantity_mt']
+            aggregated.columns = ['partner_code', 'year', 'value_usd', 'quantity_mt']
+
+            # Back to a plain integer code for the name lookup and downstream groupbys
+            aggregated['partner_code'] = aggregated['partner_code'].astype('int64')
 
-            # Convert BACI value from thousand USD to USD
-            aggregated['value_usd'] = aggregated['value_thousand_usd'] * 1000
+            # Convert BACI value from thousand USD to USD, in place
+            aggregated['value_usd'] *= 1000
 
             # Map partner codes to names
-            # Ensure data types match for merge - convert to int
-            country_codes_for_merge = self.baci_country_codes[['country_code', 'country_name']].copy()
-            country_codes_for_merge['country_code'] = pd.to_numeric(country_codes_for_merge['country_code'], errors='coerce').astype('Int64')
-
-            aggregated = aggregated.merge(
-                country_codes_for_merge,
-                left_on='partner_code',
-                right_on='country_code',
-                how='left'
-            )
+            aggregated['country_name'] = aggregated['partner_code'].map(self._baci_country_by_code)
 
             # Clean up
             aggregated = aggregated[['partner_code', 'country_name', 'year', 'value_usd', 'quantity_mt']]
@@ -883,12 +1089,118 @@ class TradeAnalyzer:
         print(f"  ✓ BACI data ready: {len(aggregated)} records")
         return aggregated
 
+    def load_baci_year(self, year, columns, row_filter, group_cols):
+        """Load one BACI year and pre-aggregate v and q over group_cols
+
+        Returns (partial sums as an Arrow table or None, matching record count, status line).
+        Runs on a worker thread, so progress is returned rather than printed.
+        """
+        filename = f"BACI_HS92_Y{year}_V202601.csv"
+        filepath = self.baci_dir / filename
+
+        if not filepath.exists():
+            return None, 0, f"  ⚠ Warning: {filename} not found, skipping year {year}"
+
+        status = f"  Loading {year}... "
+        try:
+            # Scan the Parquet copy (or the CSV if it couldn't be written); only rows passing the filter are kept
+            scanner, note = self.open_baci_year(filepath, columns, row_filter)
+            status += note
+            year_table = scanner.to_table()
+
+            # Rows matched through a non-numeric product code have no integer k to group on
+            skipped = year_table.column('k').null_count
+            if skipped:
+                year_table = year_table.filter(pc.is_valid(year_table.column('k')))
+
+            # Sum within the year so only one row per group crosses back to pandas;
+            # min_count=0 makes all-missing groups sum to 0 as pandas does
+            sum_options = pc.ScalarAggregateOptions(min_count=0)
+            year_partial = year_table.group_by(group_cols, use_threads=False).aggregate(
+                [('v', 'sum', sum_options), ('q', 'sum', sum_options)]
+            ).rename_columns(group_cols + ['v', 'q'])
+        except Exception as e:
+            return None, 0, status + f"✗ Error loading {year}: {e}"
+
+        skipped_note = f" (⚠ {skipped:,} with non-numeric product codes skipped)" if skipped else ""
+        if year_table.num_rows == 0:
+            return None, 0, status + "✓ 0 records (no matching data)" + skipped_note
+        return year_partial, year_table.num_rows, status + f"✓ {year_table.num_rows:,} records" + skipped_note
+
+    def read_baci_csv(self, csv_path):
+        """Stream a BACI yearly CSV as record batches, returns (schema, batch iterator)
+
+        The product code k is read as text and converted to int32; codes that are not plain
+        digits become null in k and are kept as text in an extra k_code column (null otherwise),
+        so they never fail the year's conversion.
+        """
+        # Memory-map the CSV so the parser reads straight from the page cache in 8 MiB blocks
+        source = pa.memory_map(str(csv_path))
+        reader = pacsv.open_csv(
+            source,
+            read_options=pacsv.ReadOptions(block_size=8 * 1024 * 1024),
+            convert_options=pacsv.ConvertOptions(column_types=self.BACI_COLUMN_TYPES)
+        )
+        k_index = reader.schema.get_field_index('k')
+        schema = reader.schema.set(k_index, pa.field('k', pa.int32())).append(pa.field('k_code', pa.string()))
+        null_code = pa.scalar(None, pa.string())
+
+        def batches():
+            with source:
+                for batch in reader:
+                    codes = batch.column(k_index)
+                    is_numeric = pc.ascii_is_decimal(codes)
+                    numeric_codes = pc.cast(pc.if_else(is_numeric, codes, null_code), pa.int32())
+                    batch = batch.set_column(k_index, 'k', numeric_codes)
+                    yield batch.append_column('k_code', pc.if_else(is_numeric, null_code, codes))
+
+        return schema, batches()
+
+    def open_baci_year(self, csv_path, columns, row_filter):
+        """Open a BACI yearly file as an Arrow scanner, converting the CSV to Parquet on first use
+
+        Returns (scanner over columns with row_filter pushed down, note) where note describes
+        a conversion or fallback ("" otherwise).
+        The Parquet copy lives in the BACI _cache folder and is rebuilt when the CSV is newer
+        or when it predates the k_code column.
+        BACI files are ordered by exporter, so row-group statistics let export scans skip most of the file.
+        """
+        parquet_path = self.baci_dir / "_cache" / csv_path.with_suffix(".parquet").name
+        if (parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+                and 'k_code' in pq.read_schema(parquet_path).names):
+            return ds.dataset(parquet_path, format="parquet").scanner(columns=columns, filter=row_filter), ""
+
+        note = "converting to Parquet (one-time)... "
+        tmp_path = parquet_path.with_suffix(".parquet.tmp")
+        try:
+            parquet_path.parent.mkdir(parents=True, exist_ok=True)
+            schema, batches = self.read_baci_csv(csv_path)
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+            tmp_path.replace(parquet_path)
+        except (OSError, pa.ArrowInvalid) as e:
+            # Unwritable cache or a value the conversion rejects: scan the CSV directly this time
+            schema, batches = self.read_baci_csv(csv_path)
+            scanner = ds.Scanner.from_batches(batches, schema=schema, columns=columns, filter=row_filter)
+            return scanner, note + f"⚠ Could not write Parquet copy ({e}), reading CSV... "
+        finally:
+            # Never leave a partial copy behind, whatever stopped the conversion
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+        return ds.dataset(parquet_path, format="parquet").scanner(columns=columns, filter=row_filter), note
+
     def fetch_comtrade_data(self, freq_code, period, reporter_code, cmd_code, flow_code, partner_code=None):
         """Fetch data from COMTRADE API"""
         print(f"\nFetching COMTRADE data...")
         print(f"  Parameters: freq={freq_code}, period={period}, reporter={reporter_code}")
         print(f"  Product={cmd_code}, flow={flow_code}, partner={partner_code or 'all'}")
 
+        import comtradeapicall
+
         try:
             data = comtradeapicall._getFinalData(
                 subscription_key=self.subscription_key,
@@ -928,29 +1240,26 @@ class TradeAnalyzer:
 
             print(f"  ✓ Fetched {len(data):,} records from COMTRADE (before filtering)")
 
-            # Store original data for fallback
-            original_data = data.copy()
-
             # CRITICAL: Try to get ONLY leaf-level (subcategory) records first
+            # Only a mask is kept, the aggregate fallback is simply the unfiltered data
             if 'isLeaf' in data.columns:
-                before_count = len(data)
-                leaf_data = data[data['isLeaf'] == True].copy()
-                removed = before_count - len(leaf_data)
+                is_leaf = data['isLeaf'] == True
+                leaf_count = int(is_leaf.sum())
+                removed = len(data) - leaf_count
 
-                if len(leaf_data) > 0:
+                if leaf_count > 0:
                     # Success: We have subcategory data
-                    print(f"  ✓ Using {len(leaf_data):,} leaf-level (subcategory) records")
+                    print(f"  ✓ Using {leaf_count:,} leaf-level (subcategory) records")
                     if removed > 0:
                         print(f"  ✓ Filtered out {removed} aggregate record(s)")
-                    data = leaf_data
+                    data = data.loc[is_leaf]
                     # Mark as subcategory data
                     data['Data_Level'] = 'Subcategory'
                 else:
                     # Fallback: No leaf data available, use aggregates
                     print(f"  ⚠ WARNING: No leaf-level subcategory data available")
-                    print(f"  ⚠ USING {len(original_data)} AGGREGATE RECORD(S) as fallback")
+                    print(f"  ⚠ USING {len(data)} AGGREGATE RECORD(S) as fallback")
                     print(f"  ⚠ Results will show AGGREGATE-LEVEL data (not broken down by subcategories)")
-                    data = original_data
                     # Mark as aggregate data
                     data['Data_Level'] = 'Aggregate'
             else:
@@ -1026,7 +1335,14 @@ class TradeAnalyzer:
         if 'Data_Level' in data.columns:
             data_level = data['Data_Level'].iloc[0] if len(data) > 0 else 'Unknown'
 
-        aggregated = data.groupby(group_cols).agg(agg_dict).reset_index()
+        # Group on categorical codes (observed=True keeps only the combinations that occur),
+        # casting the key Series rather than the caller's frame
+        code_dtypes = {col: data[col].dtype for col in ['partnerCode', 'cmdCode'] if col in group_cols}
+        group_keys = [data[col].astype('category') if col in code_dtypes else col for col in group_cols]
+        aggregated = data.groupby(group_keys, observed=True).agg(agg_dict).reset_index()
+
+        # Back to the plain code dtypes for the lookups and downstream groupbys
+        aggregated = aggregated.astype(code_dtypes)
 
         if data_level:
             aggregated['Data_Level'] = data_level
@@ -1072,18 +1388,11 @@ class TradeAnalyzer:
             aggregated['Metric_Value'] = aggregated[selected_friendly_name]
 
         if keep_subcategories:
-            # Try to fill missing product descriptions from BACI database
-            if hasattr(self, 'baci_product_codes') and self.baci_product_codes is not None:
-                baci_codes = self.baci_product_codes.copy()
-                baci_codes['code_padded'] = baci_codes['code'].astype(str).str.zfill(6)
-
-                for idx, row in aggregated[aggregated['Product_Desc'].isna()].iterrows():
-                    code_padded = str(row['Product_Code']).zfill(6)
-                    match = baci_codes[baci_codes['code_padded'] == code_padded]
-                    if not match.empty:
-                        aggregated.at[idx, 'Product_Desc'] = match.iloc[0]['description']
-
-            aggregated['Product_Desc'] = aggregated['Product_Desc'].fillna('Unknown Product')
+            # Fill missing product descriptions from the BACI database, then the placeholder
+            codes_padded = aggregated['Product_Code'].astype('string').str.zfill(6)
+            aggregated['Product_Desc'] = (aggregated['Product_Desc']
+                                          .fillna(codes_padded.map(self._baci_desc_by_code))
+                                          .fillna('Unknown Product'))
 
         print(f"  ✓ Processed {len(aggregated)} COMTRADE record(s)")
         return aggregated
@@ -1184,13 +1493,23 @@ class TradeAnalyzer:
 
         return combined
 
-    def detect_zero_values(self, data, metric):
-        """Detect partners with zero values in the chosen metric"""
-        # Filter out World total and aggregate
-        partners_only = data[data['Partner_Code'] != 0].copy()
+    def partner_metric_totals(self, data, metric_col):
+        """Sum metric_col per partner across all periods, leaving out the World total (code 0)
+
+        Computed once per all-partners run and shared by the summary, the zero-value check
+        and the bar chart.
+        """
+        # The groupby copies anyway, so the masked rows are not materialized first.
+        # Sorted by Partner_Code so nlargest keeps the lowest codes among tied totals
+        mask = data['Partner_Code'] != 0
+        return data.loc[mask].groupby(['Partner_Code', 'Partner_Name'],
+                                      observed=True)[metric_col].sum().reset_index()
 
-        # Aggregate by partner (sum across all periods)
-        partner_totals = partners_only.groupby(['Partner_Code', 'Partner_Name'])[metric].sum().reset_index()
+    def detect_zero_values(self, data, metric, partner_totals=None):
+        """Detect partners with zero values in the chosen metric"""
+        # Aggregate by partner (sum across all periods), without the World total
+        if partner_totals is None:
+            partner_totals = self.partner_metric_totals(data, metric)
 
         # Find zero-value partners
         zero_value_partners = partner_totals[partner_totals[metric] == 0]
@@ -1228,17 +1547,39 @@ class TradeAnalyzer:
             print("  ⚠ No metric columns found in data")
             return None
 
-        aggregated = data.groupby(['Partner_Code', 'Partner_Name', period_col]).agg(agg_cols).reset_index()
-
         # Preserve Source column if it exists
         if 'Source' in data.columns:
-            source_col = data.groupby(['Partner_Code', 'Partner_Name', period_col])['Source'].first().reset_index()
-            aggregated = aggregated.merge(source_col, on=['Partner_Code', 'Partner_Name', period_col], how='left')
+            agg_cols['Source'] = 'first'
+
+        # Partner_Name follows from Partner_Code, so group on the code alone and map the names back.
+        # The names are categorical: every later groupby and partner filter on this frame then
+        # works on integer codes (those groupbys pass observed=True)
+        aggregated = data.groupby(['Partner_Code', period_col], observed=True, sort=False).agg(agg_cols).reset_index()
+        partner_names = data.drop_duplicates('Partner_Code').set_index('Partner_Code')['Partner_Name']
+        aggregated.insert(1, 'Partner_Name', aggregated['Partner_Code'].map(partner_names).fillna('Unknown').astype('category'))
 
         return aggregated
 
-    def create_bar_chart(self, data, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info):
+    def get_chart_axes(self, figsize):
+        """Clear the shared chart figure, resize it and return (fig, ax) for the next chart"""
+        if self._chart_fig is None:
+            # Charts are only ever saved to files, so render off-screen with Agg
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            self._chart_fig = plt.figure(dpi=100)
+
+        fig = self._chart_fig
+        fig.clear()
+        fig.set_size_inches(figsize)
+        return fig, fig.add_subplot()
+
+    def create_bar_chart(self, data, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info,
+                         partner_totals=None):
         """Create professional bar chart for top partners using seaborn"""
+        import matplotlib.ticker as ticker
+        import seaborn as sns
+
         print("\nCreating professional bar chart visualization...")
 
         # Extract clean product description (remove code and subcategory info)
@@ -1248,15 +1589,16 @@ class TradeAnalyzer:
         sns.set_style("whitegrid")
         sns.set_context("talk", font_scale=1.2)
 
-        # Aggregate by partner (sum across all periods)
-        partner_totals = data.groupby(['Partner_Code', 'Partner_Name'])[metric_col].sum().reset_index()
+        # Aggregate by partner (sum across all periods), leaving out the World total
+        if partner_totals is None:
+            partner_totals = self.partner_metric_totals(data, metric_col)
 
-        # Filter out World total and sort
-        partners_only = partner_totals[partner_totals['Partner_Code'] != 0].copy()
-        top_partners = partners_only.nlargest(10, metric_col)
+        # Top 10 partners, ties ordered by partner code as in the exported CSV
+        top_partners = partner_totals.nlargest(10, metric_col).sort_values(
+            [metric_col, 'Partner_Code'], ascending=[False, True])
 
         # Create figure
-        fig, ax = plt.subplots(figsize=(16, 10), dpi=100)
+        fig, ax = self.get_chart_axes((16, 10))
         fig.patch.set_facecolor('white')
 
         # Use seaborn color palette
@@ -1276,9 +1618,9 @@ class TradeAnalyzer:
 
         # Format x-axis based on metric type
         if metric_type == 'value':
-            ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'${x/1e6:.1f}M' if x >= 1e6 else f'${x/1e3:.0f}K'))
+            ax.xaxis.set_major_formatter(ticker.FuncFormatter(_tick_usd_thousands_millions))
         else:
-            ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'{x/1e6:.1f}M' if x >= 1e6 else f'{x/1e3:.0f}K'))
+            ax.xaxis.set_major_formatter(ticker.FuncFormatter(_tick_thousands_millions))
 
         # Add value labels
         # Determine unit suffix based on metric name
@@ -1291,40 +1633,69 @@ class TradeAnalyzer:
         else:
             unit_suffix = ''  # No unit for generic Quantity
 
-        for bar in bars:
-            width = bar.get_width()
+        labels = []
+        for width in bars.datavalues:
             if metric_type == 'value':
                 label = f'${width/1e6:.1f}M' if width >= 1e6 else f'${width/1e3:.0f}K'
             else:
                 label = f'{width/1e6:.1f}M{unit_suffix}' if width >= 1e6 else f'{width/1e3:.0f}K{unit_suffix}'
+            labels.append(f' {label}')
 
-            ax.text(width, bar.get_y() + bar.get_height()/2, f' {label}',
-                   ha='left', va='center', fontsize=16, fontweight='bold')
+        ax.bar_label(bars, labels=labels, fontsize=16, fontweight='bold')
 
         # Invert y-axis
         ax.invert_yaxis()
 
-        sns.despine(left=True, bottom=True)
-        plt.tight_layout()
+        sns.despine(ax=ax, left=True, bottom=True)
+        fig.tight_layout()
 
         # Save figure with product code for clean filename
-        reporter_safe = self.sanitize_filename(reporter_name)
-        product_code = self.get_product_code_for_filename(product_desc)
-        flow_short = 'imp' if flow_desc == 'Imports' else 'exp'
-        metric_short = 'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt')
+        reporter_safe, flow_short, product_code, metric_short, _ = self.get_file_tags(
+            reporter_name, product_desc, flow_desc, metric_type)
 
         filename = f"BarChart_{reporter_safe}_{flow_short}_{product_code}_{metric_short}.png"
-        filepath = self.base_dir / "output" / filename
+        filepath = self.output_dir / filename
 
-        filepath.parent.mkdir(exist_ok=True)
-        plt.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none')
-        plt.close()
+        fig.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none',
+                    pil_kwargs={'compress_level': 1})
+        fig.clear()
 
         print(f"✓ Bar chart saved to: {filepath}")
         return filepath
 
-    def create_stacked_bar_chart(self, data, partner_name, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info):
+    def available_metric_columns(self, data):
+        """List the METRIC_COLUMNS present in data, in METRIC_COLUMNS order"""
+        columns = set(data.columns)
+        return [col for col in self.METRIC_COLUMNS if col in columns]
+
+    def partner_period_totals(self, data, partner_name, metric_cols, partner_mask=None):
+        """Sum metric_cols by period for one partner and for the world, returns (partner_by_period, world_by_period)
+
+        Both frames are indexed by every period in data, sorted; the partner's sums are 0 in
+        periods where it has no rows. Computed once per run and shared by the partner chart and exports.
+        partner_mask, if given, is the precomputed Partner_Name == partner_name mask over data.
+        """
+        period_col = 'Year' if 'Year' in data.columns else 'Period'
+        if partner_mask is None:
+            partner_mask = (data['Partner_Name'] == partner_name).to_numpy()
+
+        # One grouped pass: the partner's values are the metric columns zeroed outside its rows
+        partner_cols = [f'_partner_{col}' for col in metric_cols]
+        partner_values = data[metric_cols].where(
+            np.broadcast_to(partner_mask[:, None], (len(data), len(metric_cols))), 0)
+        partner_values.columns = partner_cols
+        grouped = pd.concat([data[[period_col] + metric_cols], partner_values], axis=1).groupby(period_col).sum()
+
+        partner_by_period = grouped[partner_cols].set_axis(metric_cols, axis=1)
+        world_by_period = grouped[metric_cols]
+        return partner_by_period, world_by_period
+
+    def create_stacked_bar_chart(self, data, partner_name, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info,
+                                 period_totals=None):
         """Create stacked bar chart for specific partner analysis"""
+        import matplotlib.ticker as ticker
+        import seaborn as sns
+
         print("\nCreating professional stacked bar chart...")
 
         # Extract clean product description
@@ -1334,21 +1705,25 @@ class TradeAnalyzer:
         sns.set_style("whitegrid")
         sns.set_context("talk", font_scale=1.3)
 
-        # Get recent periods (last 10)
         period_col = 'Year' if 'Year' in data.columns else 'Period'
-        periods = sorted(data[period_col].unique())[-10:]
-        recent_data = data[data[period_col].isin(periods)]
 
         # Aggregate by period
-        partner_data = recent_data[recent_data['Partner_Name'] == partner_name].groupby(period_col)[metric_col].sum()
-        world_total = recent_data.groupby(period_col)[metric_col].sum()
+        if period_totals is None:
+            period_totals = self.partner_period_totals(data, partner_name, [metric_col])
+        partner_by_period, world_by_period = period_totals
+
+        # Get recent periods (last 10); both totals share one sorted index of every period,
+        # so the recent periods are simply the last 10 rows
+        periods = world_by_period.index[-10:]
+        partner_data = partner_by_period[metric_col].iloc[-10:]
+        world_total = world_by_period[metric_col].iloc[-10:]
 
         # Calculate rest of world
         rest_of_world = world_total - partner_data
         partner_share = (partner_data / world_total * 100).fillna(0)
 
         # Create figure
-        fig, ax = plt.subplots(figsize=(18, 10), dpi=100)
+        fig, ax = self.get_chart_axes((18, 10))
         fig.patch.set_facecolor('white')
 
         x_positions = range(len(periods))
@@ -1358,11 +1733,11 @@ class TradeAnalyzer:
         colors = sns.color_palette("Set2", n_colors=2)
 
         # Plot bars
-        bars1 = ax.bar(x_positions, partner_data.reindex(periods, fill_value=0),
+        bars1 = ax.bar(x_positions, partner_data,
                        label=partner_name, color=colors[0],
                        edgecolor='white', linewidth=2.5)
-        bars2 = ax.bar(x_positions, rest_of_world.reindex(periods, fill_value=0),
-                       bottom=partner_data.reindex(periods, fill_value=0),
+        bars2 = ax.bar(x_positions, rest_of_world,
+                       bottom=partner_data,
                        label='Rest of World', color=colors[1],
                        edgecolor='white', linewidth=2.5)
 
@@ -1376,120 +1751,91 @@ class TradeAnalyzer:
 
         # Format y-axis
         if metric_type == 'value':
-            ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'${x/1e9:.1f}B' if x >= 1e9
-                                                              else f'${x/1e6:.1f}M' if x >= 1e6
-                                                              else f'${x/1e3:.0f}K'))
+            ax.yaxis.set_major_formatter(ticker.FuncFormatter(_tick_usd_up_to_billions))
         else:
-            ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'{x/1e9:.1f}B' if x >= 1e9
-                                                              else f'{x/1e6:.1f}M' if x >= 1e6
-                                                              else f'{x/1e3:.0f}K'))
+            ax.yaxis.set_major_formatter(ticker.FuncFormatter(_tick_up_to_billions))
 
         ax.set_xticks(x_positions)
         ax.set_xticklabels(x_labels, rotation=45, ha='right', fontsize=14)
 
         # Add labels
-        for i, bar1 in enumerate(bars1):
-            if i < len(partner_share):
-                partner_value = bar1.get_height()
-                share_pct = partner_share.iloc[i]
-
-                if metric_type == 'value':
-                    value_label = f'${partner_value/1e6:.1f}M' if partner_value >= 1e6 else f'${partner_value/1e3:.0f}K'
-                else:
-                    value_label = f'{partner_value/1e6:.1f}M' if partner_value >= 1e6 else f'{partner_value/1e3:.0f}K'
+        labels = []
+        for partner_value, share_pct in zip(bars1.datavalues, partner_share.to_numpy()):
+            if metric_type == 'value':
+                value_label = f'${partner_value/1e6:.1f}M' if partner_value >= 1e6 else f'${partner_value/1e3:.0f}K'
+            else:
+                value_label = f'{partner_value/1e6:.1f}M' if partner_value >= 1e6 else f'{partner_value/1e3:.0f}K'
+            labels.append(f'{value_label}\n({share_pct:.1f}%)')
+        labels += [''] * (len(bars1) - len(labels))
 
-                label_text = f'{value_label}\n({share_pct:.1f}%)'
-                ax.text(bar1.get_x() + bar1.get_width()/2, partner_value/2,
-                       label_text, ha='center', va='center',
-                       fontsize=15, fontweight='bold', color='white')
+        ax.bar_label(bars1, labels=labels, label_type='center',
+                     fontsize=15, fontweight='bold', color='white')
 
         # Legend
         legend = ax.legend(loc='upper left', bbox_to_anchor=(1.01, 1.0), fontsize=18,
                           frameon=True, shadow=True)
 
-        sns.despine(left=True, bottom=True)
-        plt.tight_layout()
+        sns.despine(ax=ax, left=True, bottom=True)
+        fig.tight_layout()
 
         # Save with product code for clean filename
-        reporter_safe = self.sanitize_filename(reporter_name)
-        product_code = self.get_product_code_for_filename(product_desc)
-        partner_safe = self.sanitize_filename(partner_name)
-        flow_short = 'imp' if flow_desc == 'Imports' else 'exp'
-        metric_short = 'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt')
+        reporter_safe, flow_short, product_code, metric_short, partner_safe = self.get_file_tags(
+            reporter_name, product_desc, flow_desc, metric_type, partner_name)
 
         filename = f"StackedBar_{reporter_safe}_{flow_short}_{product_code}_{partner_safe}_{metric_short}.png"
-        filepath = self.base_dir / "output" / filename
+        filepath = self.output_dir / filename
 
-        filepath.parent.mkdir(exist_ok=True)
-        plt.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none')
-        plt.close()
+        fig.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none',
+                    pil_kwargs={'compress_level': 1})
+        fig.clear()
 
         print(f"✓ Stacked bar chart saved to: {filepath}")
         return filepath
 
-    def export_specific_partner_results(self, data, partner_name, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info):
+    def export_specific_partner_results(self, data, partner_name, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info,
+                                        period_totals=None):
         """Export specific partner analysis to CSV with year-by-year data and share for ALL metrics"""
         period_col = 'Year' if 'Year' in data.columns else 'Period'
-        all_periods = sorted(data[period_col].unique())
 
-        # Identify all available metric columns
-        baci_metrics = ['Trade_Value_USD', 'Quantity_MT']
-        comtrade_metrics = ['Primary_Value_USD', 'FOB_Value_USD', 'CIF_Value_USD', 'Quantity', 'Net_Weight_Kg', 'Gross_Weight_Kg']
+        # Identify all available metric columns (the Metric_Value copy of the selected one is left out)
+        available_metrics = [col for col in self.available_metric_columns(data) if col != 'Metric_Value']
 
-        available_metrics = []
-        for col in baci_metrics + comtrade_metrics:
-            if col in data.columns:
-                available_metrics.append(col)
+        if period_totals is None:
+            period_totals = self.partner_period_totals(data, partner_name, list(dict.fromkeys(available_metrics + [metric_col])))
+        # The world totals hold every period, sorted; align the partner's on them (0 where it has no rows)
+        world_by_period = period_totals[1]
+        all_periods = world_by_period.index
+        partner_by_period = period_totals[0].reindex(all_periods, fill_value=0)
 
-        # Build export data with all periods and ALL available metrics
-        export_rows = []
-        for period in all_periods:
-            row_data = {period_col: period}
+        # Build export data with all periods and ALL available metrics, one column at a time
+        export_cols = {period_col: all_periods}
+        for metric in available_metrics:
+            export_cols[f'{partner_name}_{metric}'] = partner_by_period[metric].to_numpy()
+            export_cols[f'World_{metric}'] = world_by_period[metric].to_numpy()
 
-            # Get partner and world data for this period
-            partner_period_data = data[(data['Partner_Name'] == partner_name) & (data[period_col] == period)]
-            world_period_data = data[data[period_col] == period]
+        # Calculate share based on selected metric
+        partner_selected = partner_by_period[metric_col]
+        world_selected = world_by_period[metric_col]
+        share_pct = (partner_selected / world_selected * 100).where(world_selected > 0, 0)
+        export_cols['Partner_Share_Percent'] = share_pct.round(2).to_numpy()
 
-            # Add all available metrics
-            for metric in available_metrics:
-                partner_val = partner_period_data[metric].sum() if len(partner_period_data) > 0 else 0
-                world_val = world_period_data[metric].sum() if len(world_period_data) > 0 else 0
-
-                row_data[f'{partner_name}_{metric}'] = partner_val
-                row_data[f'World_{metric}'] = world_val
-
-            # Calculate share based on selected metric
-            partner_selected = partner_period_data[metric_col].sum() if len(partner_period_data) > 0 else 0
-            world_selected = world_period_data[metric_col].sum() if len(world_period_data) > 0 else 0
-            share_pct = (partner_selected / world_selected * 100) if world_selected > 0 else 0
-            row_data['Partner_Share_Percent'] = round(share_pct, 2)
-
-            export_rows.append(row_data)
-
-        export_df = pd.DataFrame(export_rows)
+        export_df = pd.DataFrame(export_cols)
 
         # Generate filename
-        reporter_safe = self.sanitize_filename(reporter_name)
-        product_code = self.get_product_code_for_filename(product_desc)
-        partner_safe = self.sanitize_filename(partner_name)
-        flow_short = 'imp' if flow_desc == 'Imports' else 'exp'
-        metric_short = 'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt')
+        reporter_safe, flow_short, product_code, metric_short, partner_safe = self.get_file_tags(
+            reporter_name, product_desc, flow_desc, metric_type, partner_name)
 
         filename = f"Partner_{reporter_safe}_{flow_short}_{product_code}_{partner_safe}_{metric_short}.csv"
-        filepath = self.base_dir / "output" / filename
+        filepath = self.output_dir / filename
 
-        filepath.parent.mkdir(exist_ok=True)
-        export_df.to_csv(filepath, index=False)
+        with open(filepath, 'wb', buffering=self.EXPORT_BUFFER_SIZE) as fh:
+            export_df.to_csv(fh, index=False)
 
         print(f"\n✓ Partner analysis exported to: {filepath}")
         return filepath
 
     def export_results(self, data, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info, partner_name=None):
         """Export results to CSV and .txt summary"""
-        # Get product code for filename
-        product_code = self.get_product_code_for_filename(product_desc)
-        metric_short = 'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt')
-
         # Aggregate by partner
         period_col = 'Year' if 'Year' in data.columns else 'Period'
 
@@ -1499,20 +1845,17 @@ class TradeAnalyzer:
                                                         reporter_name, product_desc, flow_desc, source_info), None
         else:
             # All partners analysis - export totals by partner with ALL available metrics
-            # Identify all metric columns in the data
-            baci_metrics = ['Trade_Value_USD', 'Quantity_MT']
-            comtrade_metrics = ['Primary_Value_USD', 'FOB_Value_USD', 'CIF_Value_USD', 'Quantity', 'Net_Weight_Kg', 'Gross_Weight_Kg', 'Metric_Value']
-
             # Build aggregation dict for all available metrics
-            agg_dict = {}
-            for col in baci_metrics + comtrade_metrics:
-                if col in data.columns:
-                    agg_dict[col] = 'sum'
+            agg_dict = dict.fromkeys(self.available_metric_columns(data), 'sum')
+
+            # Groups come out unsorted; the single sort below orders them by the chosen metric
+            partner_totals = data.groupby(['Partner_Code', 'Partner_Name'], sort=False, observed=True).agg(agg_dict).reset_index()
 
-            partner_totals = data.groupby(['Partner_Code', 'Partner_Name']).agg(agg_dict).reset_index()
+            # Back to plain names, so the World row below can add a name of its own
+            partner_totals['Partner_Name'] = partner_totals['Partner_Name'].astype(object)
 
-            # Sort by chosen metric
-            partner_totals = partner_totals.sort_values(metric_col, ascending=False)
+            # Sort by chosen metric, ties by partner code (renumbered, so the World row can be appended at the end)
+            partner_totals = partner_totals.sort_values([metric_col, 'Partner_Code'], ascending=[False, True], ignore_index=True)
 
             # Calculate World total for all metrics
             world_row_data = {
@@ -1522,33 +1865,29 @@ class TradeAnalyzer:
             for col in agg_dict.keys():
                 world_row_data[col] = partner_totals[partner_totals['Partner_Code'] != 0][col].sum()
 
-            world_row = pd.DataFrame([world_row_data])
-
-            # Combine partner totals with world row
-            if len(partner_totals) > 0:
-                export_data = pd.concat([partner_totals, world_row], ignore_index=True)
-            else:
-                export_data = world_row
+            # Append the world row in place rather than concatenating a one-row frame
+            partner_totals.loc[len(partner_totals)] = world_row_data
+            export_data = partner_totals
 
         # Generate filename with product code
-        reporter_safe = self.sanitize_filename(reporter_name)
-        flow_short = 'imp' if flow_desc == 'Imports' else 'exp'
+        reporter_safe, flow_short, product_code, metric_short, _ = self.get_file_tags(
+            reporter_name, product_desc, flow_desc, metric_type)
         base_filename = f"AllPartners_{reporter_safe}_{flow_short}_{product_code}_{metric_short}"
 
         # Save CSV
         csv_filename = base_filename + ".csv"
-        csv_filepath = self.base_dir / "output" / csv_filename
+        csv_filepath = self.output_dir / csv_filename
 
-        csv_filepath.parent.mkdir(exist_ok=True)
-        export_data.to_csv(csv_filepath, index=False)
+        with open(csv_filepath, 'wb', buffering=self.EXPORT_BUFFER_SIZE) as fh:
+            export_data.to_csv(fh, index=False)
 
         print(f"\n✓ Results exported to: {csv_filepath}")
 
         # Create .txt summary
         txt_filename = base_filename + "_Summary.txt"
-        txt_filepath = self.base_dir / "output" / txt_filename
+        txt_filepath = self.output_dir / txt_filename
 
-        with open(txt_filepath, 'w', encoding='utf-8') as f:
+        with open(txt_filepath, 'w', encoding='utf-8', buffering=self.EXPORT_BUFFER_SIZE) as f:
             f.write("="*70 + "\n")
             f.write("HYBRID TRADE DATA ANALYSIS SUMMARY\n")
             f.write("="*70 + "\n\n")
@@ -1601,16 +1940,21 @@ class TradeAnalyzer:
 
     def analyze_subcategories(self, data, partner_name, metric_col):
         """Analyze top subcategories for specific partner"""
-        # Filter for specific partner
-        partner_data = data[data['Partner_Name'] == partner_name].copy()
+        # Filter for specific partner (the groupby below copies, so no copy here)
+        partner_data = data.loc[data['Partner_Name'] == partner_name]
 
         if len(partner_data) == 0:
             return None
 
         # Filter to only include valid HS codes (2, 4, or 6 digits)
         # This excludes COMTRADE's intermediate 5-digit aggregation codes
-        partner_data['code_length'] = partner_data['Product_Code'].astype(str).str.len()
-        partner_data = partner_data[partner_data['code_length'].isin([2, 4, 6])].copy()
+        codes = partner_data['Product_Code']
+        if pd.api.types.is_integer_dtype(codes):
+            # Digit counts straight from the integer ranges, without formatting every code
+            valid_code = codes.between(10, 99) | codes.between(1000, 9999) | codes.between(100000, 999999)
+        else:
+            valid_code = codes.astype(str).str.len().isin([2, 4, 6])
+        partner_data = partner_data.loc[valid_code]
 
         if len(partner_data) == 0:
             print("  ⚠ No valid HS subcategories found")
@@ -1618,15 +1962,18 @@ class TradeAnalyzer:
 
         # Aggregate by product code using the selected metric column
         agg_dict = {metric_col: 'sum'}
-        subcategory_totals = partner_data.groupby(['Product_Code', 'Product_Desc']).agg(agg_dict).reset_index()
+        subcategory_totals = partner_data.groupby(['Product_Code', 'Product_Desc'], observed=True, sort=False).agg(agg_dict).reset_index()
 
-        # Sort by chosen metric (return ALL subcategories sorted)
-        all_subcategories = subcategory_totals.sort_values(metric_col, ascending=False).reset_index(drop=True)
+        # Sort by chosen metric, ties by product code (return ALL subcategories sorted)
+        all_subcategories = subcategory_totals.sort_values([metric_col, 'Product_Code'], ascending=[False, True], ignore_index=True)
 
         return all_subcategories
 
     def create_subcategory_bar_chart(self, subcategory_data, partner_name, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info):
         """Create bar chart for top 5 subcategories"""
+        import matplotlib.ticker as ticker
+        import seaborn as sns
+
         print("\nCreating subcategory bar chart...")
 
         # Use only top 5 for chart
@@ -1640,7 +1987,7 @@ class TradeAnalyzer:
         sns.set_context("talk", font_scale=1.2)
 
         # Create figure
-        fig, ax = plt.subplots(figsize=(16, 12), dpi=100)
+        fig, ax = self.get_chart_axes((16, 12))
         fig.patch.set_facecolor('white')
 
         # Use seaborn color palette
@@ -1669,40 +2016,37 @@ class TradeAnalyzer:
 
         # Format x-axis
         if metric_type == 'value':
-            ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'${x/1e6:.1f}M' if x >= 1e6 else f'${x/1e3:.0f}K'))
+            ax.xaxis.set_major_formatter(ticker.FuncFormatter(_tick_usd_thousands_millions))
         else:
-            ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, p: f'{x/1e6:.1f}M' if x >= 1e6 else f'{x/1e3:.0f}K'))
+            ax.xaxis.set_major_formatter(ticker.FuncFormatter(_tick_thousands_millions))
 
         # Add value labels
-        for bar in bars:
-            width = bar.get_width()
+        labels = []
+        for width in bars.datavalues:
             if metric_type == 'value':
                 label = f'${width/1e6:.1f}M' if width >= 1e6 else f'${width/1e3:.0f}K'
             else:
                 label = f'{width/1e6:.1f}M' if width >= 1e6 else f'{width/1e3:.0f}K'
+            labels.append(f' {label}')
 
-            ax.text(width, bar.get_y() + bar.get_height()/2, f' {label}',
-                   ha='left', va='center', fontsize=16, fontweight='bold')
+        ax.bar_label(bars, labels=labels, fontsize=16, fontweight='bold')
 
         # Invert y-axis
         ax.invert_yaxis()
 
-        sns.despine(left=True, bottom=True)
-        plt.tight_layout()
+        sns.despine(ax=ax, left=True, bottom=True)
+        fig.tight_layout()
 
         # Save figure with product code for clean filename
-        reporter_safe = self.sanitize_filename(reporter_name)
-        product_code = self.get_product_code_for_filename(product_desc)
-        partner_safe = self.sanitize_filename(partner_name)
-        flow_short = 'imp' if flow_desc == 'Imports' else 'exp'
-        metric_short = 'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt')
+        reporter_safe, flow_short, product_code, metric_short, partner_safe = self.get_file_tags(
+            reporter_name, product_desc, flow_desc, metric_type, partner_name)
 
         filename = f"Subcats_{reporter_safe}_{flow_short}_{product_code}_{partner_safe}_{metric_short}.png"
-        filepath = self.base_dir / "output" / filename
+        filepath = self.output_dir / filename
 
-        filepath.parent.mkdir(exist_ok=True)
-        plt.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none')
-        plt.close()
+        fig.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white', edgecolor='none',
+                    pil_kwargs={'compress_level': 1})
+        fig.clear()
 
         print(f"✓ Subcategory bar chart saved to: {filepath}")
         return filepath
@@ -1710,51 +2054,45 @@ class TradeAnalyzer:
     def export_subcategory_results(self, subcategory_data, partner_name, metric_col, metric_name, metric_type, reporter_name, product_desc, flow_desc, source_info):
         """Export subcategory analysis to CSV with totals"""
         # Add total row to CSV
-        export_data = subcategory_data.copy()
+        # subcategory_data is still used by the chart and summary, so it is not appended to
+        # in place; the concat already builds a new frame, so it is not copied first either
         total_row = pd.DataFrame([{
             'Product_Code': 'TOTAL',
             'Product_Desc': 'Total (all subcategories)',
-            metric_col: export_data[metric_col].sum()
+            metric_col: subcategory_data[metric_col].sum()
         }])
         # Combine export data with total row
-        if len(export_data) > 0:
-            export_data = pd.concat([export_data, total_row], ignore_index=True)
+        if len(subcategory_data) > 0:
+            export_data = pd.concat([subcategory_data, total_row], ignore_index=True)
         else:
             export_data = total_row
 
         # Generate clean filename
-        reporter_safe = self.sanitize_filename(reporter_name)
-        product_code = self.get_product_code_for_filename(product_desc)
-        partner_safe = self.sanitize_filename(partner_name)
-        flow_short = 'imp' if flow_desc == 'Imports' else 'exp'
-        metric_short = 'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt')
+        reporter_safe, flow_short, product_code, metric_short, partner_safe = self.get_file_tags(
+            reporter_name, product_desc, flow_desc, metric_type, partner_name)
 
         csv_filename = f"Subcats_{reporter_safe}_{flow_short}_{product_code}_{partner_safe}_{metric_short}.csv"
-        csv_filepath = self.base_dir / "output" / csv_filename
+        csv_filepath = self.output_dir / csv_filename
 
-        csv_filepath.parent.mkdir(exist_ok=True)
-        export_data.to_csv(csv_filepath, index=False)
+        with open(csv_filepath, 'wb', buffering=self.EXPORT_BUFFER_SIZE) as fh:
+            export_data.to_csv(fh, index=False)
 
         print(f"✓ Subcategory results exported to: {csv_filepath}")
 
         return csv_filepath
 
     def export_consolidated_summary(self, combined_data, subcategory_data, partner_name, metric_col, metric_name, metric_type,
-                                    reporter_name, product_desc, flow_desc, source_info):
+                                    reporter_name, product_desc, flow_desc, source_info, period_totals=None,
+                                    partner_mask=None):
         """Export ONE consolidated summary file with all terminal output"""
         # Generate clean filename
-        reporter_safe = self.sanitize_filename(reporter_name)
-        product_code = self.get_product_code_for_filename(product_desc)
-        partner_safe = self.sanitize_filename(partner_name)
-        flow_short = 'imp' if flow_desc == 'Imports' else 'exp'
-        metric_short = 'Val' if metric_type == 'value' else ('Qty' if metric_type == 'quantity' else 'Wgt')
+        reporter_safe, flow_short, product_code, metric_short, partner_safe = self.get_file_tags(
+            reporter_name, product_desc, flow_desc, metric_type, partner_name)
 
         txt_filename = f"Summary_{reporter_safe}_{flow_short}_{product_code}_{partner_safe}_{metric_short}.txt"
-        txt_filepath = self.base_dir / "output" / txt_filename
-
-        txt_filepath.parent.mkdir(exist_ok=True)
+        txt_filepath = self.output_dir / txt_filename
 
-        with open(txt_filepath, 'w', encoding='utf-8') as f:
+        with open(txt_filepath, 'w', encoding='utf-8', buffering=self.EXPORT_BUFFER_SIZE) as f:
             f.write("="*70 + "\n")
             f.write("HYBRID TRADE DATA ANALYSIS - COMPLETE SUMMARY\n")
             f.write("="*70 + "\n\n")
@@ -1768,10 +2106,12 @@ class TradeAnalyzer:
             f.write(f"Partner:            {partner_name}\n")
             f.write(f"Metric:             {metric_name}\n\n")
 
-            # Calculate and write totals
-            partner_data = combined_data[combined_data['Partner_Name'] == partner_name]
-            total_partner = partner_data[metric_col].sum()
-            total_world = combined_data[metric_col].sum()
+            # Calculate and write totals (both read from the one metric column array)
+            if partner_mask is None:
+                partner_mask = (combined_data['Partner_Name'] == partner_name).to_numpy()
+            metric_values = combined_data[metric_col].to_numpy()
+            total_partner = np.nansum(metric_values[partner_mask])
+            total_world = np.nansum(metric_values)
             share = (total_partner / total_world * 100) if total_world > 0 else 0
 
             f.write("="*70 + "\n")
@@ -1794,15 +2134,16 @@ class TradeAnalyzer:
 
             # Write recent periods data
             period_col = 'Year' if 'Year' in combined_data.columns else 'Period'
-            periods = sorted(combined_data[period_col].unique())[-10:]
+            if period_totals is None:
+                period_totals = self.partner_period_totals(combined_data, partner_name, [metric_col], partner_mask)
+            partner_by_period = period_totals[0][metric_col]
+            world_by_period = period_totals[1][metric_col]
+            periods = world_by_period.index[-10:]
 
             f.write("-"*70 + "\n")
             f.write(f"RECENT {len(periods)} PERIODS - PARTNER PERFORMANCE:\n")
             f.write("-"*70 + "\n\n")
 
-            partner_by_period = partner_data.groupby(period_col)[metric_col].sum()
-            world_by_period = combined_data.groupby(period_col)[metric_col].sum()
-
             f.write(f"{period_col:12s}  {partner_name:20s}  {'World Total':20s}  {'Share %':>10s}\n")
             f.write("-"*70 + "\n")
 
@@ -1832,37 +2173,31 @@ class TradeAnalyzer:
 
                 # Display top 10 in txt file
                 top_10 = subcategory_data.head(10)
-
-                for idx, row in top_10.iterrows():
-                    rank = idx + 1
-                    code = row['Product_Code']
-                    desc = row['Product_Desc']
-
-                    f.write(f"{rank:2d}. {code} - {desc}\n")
-
-                    # Handle both BACI (Trade_Value_USD, Quantity_MT) and COMTRADE (Metric_Value) columns
-                    if 'Trade_Value_USD' in row and 'Quantity_MT' in row:
-                        # BACI data - show both value and quantity
-                        if metric_name == 'Trade_Value_USD':
-                            f.write(f"    Trade Value: ${row['Trade_Value_USD']:,.2f}\n")
-                            f.write(f"    Quantity:    {row['Quantity_MT']:,.2f} MT\n")
-                        else:
-                            f.write(f"    Quantity:    {row['Quantity_MT']:,.2f} MT\n")
-                            f.write(f"    Trade Value: ${row['Trade_Value_USD']:,.2f}\n")
-                    elif 'Metric_Value' in row:
-                        # COMTRADE data - show metric value with appropriate formatting
-                        if metric_type == 'value':
-                            f.write(f"    {metric_name}: ${row['Metric_Value']:,.2f}\n")
-                        else:
-                            f.write(f"    {metric_name}: {row['Metric_Value']:,.2f}\n")
+                columns = top_10.columns
+                currency = '$' if metric_type == 'value' else ''
+
+                # Handle both BACI (Trade_Value_USD, Quantity_MT) and COMTRADE (Metric_Value) columns;
+                # the layout depends only on the columns, so each detail line is formatted column-wise
+                if 'Trade_Value_USD' in columns and 'Quantity_MT' in columns:
+                    # BACI data - show both value and quantity
+                    value_lines = [f"    Trade Value: ${v:,.2f}\n" for v in top_10['Trade_Value_USD'].to_numpy()]
+                    quantity_lines = [f"    Quantity:    {q:,.2f} MT\n" for q in top_10['Quantity_MT'].to_numpy()]
+                    if metric_name == 'Trade_Value_USD':
+                        detail_lines = [v + q for v, q in zip(value_lines, quantity_lines)]
                     else:
-                        # Fallback - use metric_col
-                        val = row.get(metric_col, 0)
-                        if metric_type == 'value':
-                            f.write(f"    {metric_name}: ${val:,.2f}\n")
-                        else:
-                            f.write(f"    {metric_name}: {val:,.2f}\n")
-                    f.write("\n")
+                        detail_lines = [q + v for v, q in zip(value_lines, quantity_lines)]
+                else:
+                    # COMTRADE data - show metric value with appropriate formatting
+                    # Fallback - use metric_col
+                    value_col = 'Metric_Value' if 'Metric_Value' in columns else metric_col
+                    values = top_10[value_col].to_numpy() if value_col in columns else [0] * len(top_10)
+                    detail_lines = [f"    {metric_name}: {currency}{v:,.2f}\n" for v in values]
+
+                f.write(''.join(
+                    f"{rank:2d}. {code} - {desc}\n{details}\n"
+                    for rank, code, desc, details in zip(top_10.index + 1, top_10['Product_Code'].to_numpy(),
+                                                         top_10['Product_Desc'].to_numpy(), detail_lines)
+                ))
 
             f.write("="*70 + "\n")
             f.write("End of Analysis Summary\n")
@@ -1871,8 +2206,83 @@ class TradeAnalyzer:
         print(f"✓ Complete analysis summary exported to: {txt_filepath}")
         return txt_filepath
 
-    def run(self):
-        """Main execution flow"""
+    def resolve_config(self, config):
+        """Validate every setting of a RunConfig in one pass, returns a dict of resolved inputs or None"""
+        def require(result):
+            ok, value = result
+            if not ok:
+                raise ValueError(value)
+            return value
+
+        try:
+            freq_code = require(self.validate_frequency(config.frequency))
+            default_source = 'COMTRADE' if freq_code == 'M' else 'BACI'
+            data_source = require(self.validate_data_source(config.source or default_source, freq_code))
+            period, period_summary = require(self.validate_period(config.period, freq_code, data_source))
+            reporter = require(self.validate_country(config.reporter, "reporter"))
+            product = require(self.validate_product(config.product))
+            flow = require(self.validate_trade_direction(config.direction))
+            if str(config.partner).strip().upper() in ['A', 'ALL']:
+                partner = ('all', None, None, None)
+            else:
+                partner = ('specific',) + require(self.validate_country(config.partner, "partner"))
+            metric = require(self.validate_metric_baci(config.metric or 'V')) if data_source == 'BACI' else None
+        except ValueError as e:
+            print(f"\n{e}")
+            return None
+
+        if period_summary:
+            print(period_summary)
+        print(f"✓ Reporter: {reporter[1]} (Code: {reporter[0]})")
+        print(f"✓ Product: {product[1]}")
+
+        return {
+            'freq_code': freq_code,
+            'data_source': data_source,
+            'period': period,
+            'reporter': reporter,
+            'product': product,
+            'flow': flow,
+            'partner': partner,
+            'metric': metric,
+        }
+
+    def print_block(self, title, rows):
+        """Print a titled header block of aligned label/value rows with a single print call"""
+        rule = "="*60
+        lines = ["\n" + rule, title, rule]
+        lines.extend(f"{label + ':':17s}{value}" for label, value in rows)
+        lines.append(rule)
+        print("\n".join(lines))
+
+    def run(self, config=None):
+        """Main execution flow - prompts for inputs, or takes them from a RunConfig for batch runs
+
+        Repeated interactive analyses run in this loop rather than by recursion, so each
+        finished analysis releases its data before the next one starts.
+        """
+        while self.run_analysis(config):
+            print(f"\n{'='*60}")
+            print("ANALYSIS COMPLETE")
+            print(f"{'='*60}\n")
+
+            # Batch runs stop after a single analysis
+            if config is not None:
+                return
+
+            # Ask if user wants another analysis
+            print("Run another analysis?")
+            print("  Y  or  Yes  :  Start a new analysis")
+            print("  N  or  No   :  Exit the program")
+            print("")
+            another = input("Enter choice: ").strip().upper()
+            if another not in ['Y', 'YES']:
+                return
+            print("\n" * 2)
+
+    def run_analysis(self, config=None):
+        """Run one analysis; returns True when it completes (including a selection with no
+        non-zero trade), None when it is cancelled"""
         print("\n" + "="*60)
         print("INTERNATIONAL TRADE DATA ANALYSIS TOOL")
         print("="*60)
@@ -1881,14 +2291,29 @@ class TradeAnalyzer:
         print("  COMTRADE  :  1962-present (as reported, annual and monthly)")
         print("="*60)
 
-        # Get user inputs
-        freq_code = self.get_frequency_input()
-        data_source = self.get_data_source_input(freq_code)
-        period = self.get_period_input(freq_code, data_source)
-        reporter_code, reporter_name, reporter_baci_code = self.get_country_input("reporter")
-        cmd_code, product_desc = self.get_product_input()
-        flow_code, flow_desc = self.get_trade_direction()
-        partner_choice, partner_code, partner_name, partner_baci_code = self.get_partner_choice()
+        if config is None:
+            # Get user inputs
+            freq_code = self.get_frequency_input()
+            data_source = self.get_data_source_input(freq_code)
+            period = self.get_period_input(freq_code, data_source)
+            reporter_code, reporter_name, reporter_baci_code = self.get_country_input("reporter")
+            cmd_code, product_desc = self.get_product_input()
+            flow_code, flow_desc = self.get_trade_direction()
+            partner_choice, partner_code, partner_name, partner_baci_code = self.get_partner_choice()
+        else:
+            # Batch run: all inputs validated up front, no prompts
+            inputs = self.resolve_config(config)
+            if inputs is None:
+                print("\n✗ Analysis cancelled: Invalid configuration")
+                return
+            freq_code = inputs['freq_code']
+            data_source = inputs['data_source']
+            self.selected_source = data_source
+            period = inputs['period']
+            reporter_code, reporter_name, reporter_baci_code = inputs['reporter']
+            cmd_code, product_desc = inputs['product']
+            flow_code, flow_desc = inputs['flow']
+            partner_choice, partner_code, partner_name, partner_baci_code = inputs['partner']
 
         # Determine years/periods for source info
         if freq_code == 'A':
@@ -1906,38 +2331,34 @@ class TradeAnalyzer:
         metric_type = None
         metric_col = None
 
+        # Label/value rows shared by the configuration headers below
+        run_rows = [
+            ("Data Source", data_source),
+            ("Frequency", 'Annual' if freq_code == 'A' else 'Monthly'),
+            ("Period", period.replace(',', ', ') if ',' in period else period),
+            ("Reporter", reporter_name),
+            ("Product", product_desc),
+            ("Direction", flow_desc),
+        ]
+        analysis_type = 'All Partners' if partner_choice == 'all' else f'Specific Partner: {partner_name}'
+
         if data_source == 'BACI':
             # BACI: Get metric choice first (only V and Q available)
-            metric_name, metric_type, metric_col = self.get_metric_choice_baci()
+            if config is None:
+                metric_name, metric_type, metric_col = self.get_metric_choice_baci()
+            else:
+                metric_name, metric_type, metric_col = inputs['metric']
 
-            print("\n" + "="*60)
-            print("ANALYSIS CONFIGURATION")
-            print("="*60)
-            print(f"Data Source:     {data_source}")
-            print(f"Frequency:       {'Annual' if freq_code == 'A' else 'Monthly'}")
-            print(f"Period:          {period.replace(',', ', ') if ',' in period else period}")
-            print(f"Reporter:        {reporter_name}")
-            print(f"Product:         {product_desc}")
-            print(f"Direction:       {flow_desc}")
-            print(f"Analysis Type:   {'All Partners' if partner_choice == 'all' else f'Specific Partner: {partner_name}'}")
-            print(f"Metric:          {metric_name}")
-            print("="*60)
+            self.print_block("ANALYSIS CONFIGURATION", run_rows + [
+                ("Analysis Type", analysis_type),
+                ("Metric", metric_name)])
 
             # Load BACI data
             data_subcategories = self.load_baci_data(years, reporter_baci_code, cmd_code, flow_code, keep_subcategories=keep_subs)
 
         else:
             # COMTRADE: Fetch data first, then show available metrics
-            print("\n" + "="*60)
-            print("FETCHING DATA")
-            print("="*60)
-            print(f"Data Source:     {data_source}")
-            print(f"Frequency:       {'Annual' if freq_code == 'A' else 'Monthly'}")
-            print(f"Period:          {period.replace(',', ', ') if ',' in period else period}")
-            print(f"Reporter:        {reporter_name}")
-            print(f"Product:         {product_desc}")
-            print(f"Direction:       {flow_desc}")
-            print("="*60)
+            self.print_block("FETCHING DATA", run_rows)
 
             raw_comtrade = self.fetch_comtrade_data(freq_code, period, reporter_code, cmd_code, flow_code, None)
 
@@ -1953,24 +2374,22 @@ class TradeAnalyzer:
                 return
 
             # Let user choose from available metrics
-            metric_name, metric_type, metric_col = self.get_metric_choice_comtrade(available_metrics)
+            if config is None:
+                metric_name, metric_type, metric_col = self.get_metric_choice_comtrade(available_metrics)
+            else:
+                ok, result = self.validate_metric_comtrade(config.metric or 'PV', available_metrics)
+                if not ok:
+                    print(result)
+                    result = (None, None, None)
+                metric_name, metric_type, metric_col = result
 
             if metric_col is None:
                 print("\n✗ Analysis cancelled: No metric selected")
                 return
 
-            print("\n" + "="*60)
-            print("ANALYSIS CONFIGURATION")
-            print("="*60)
-            print(f"Data Source:     {data_source}")
-            print(f"Frequency:       {'Annual' if freq_code == 'A' else 'Monthly'}")
-            print(f"Period:          {period.replace(',', ', ') if ',' in period else period}")
-            print(f"Reporter:        {reporter_name}")
-            print(f"Product:         {product_desc}")
-            print(f"Direction:       {flow_desc}")
-            print(f"Analysis Type:   {'All Partners' if partner_choice == 'all' else f'Specific Partner: {partner_name}'}")
-            print(f"Metric:          {metric_name} ({metric_col})")
-            print("="*60)
+            self.print_block("ANALYSIS CONFIGURATION", run_rows + [
+                ("Analysis Type", analysis_type),
+                ("Metric", f"{metric_name} ({metric_col})")])
 
             # Process COMTRADE data with selected metric
             data_subcategories = self.process_comtrade_data(raw_comtrade, freq_code, metric_col, keep_subcategories=keep_subs)
@@ -1982,6 +2401,15 @@ class TradeAnalyzer:
             print("\n✗ Analysis cancelled: No data available from any source")
             return
 
+        # Compact the key columns once: partner names as categories (the partner filters then
+        # compare category codes), partner codes and periods as int32
+        if not isinstance(combined_data['Partner_Name'].dtype, pd.CategoricalDtype):
+            combined_data['Partner_Name'] = combined_data['Partner_Name'].astype('category')
+        period_col = 'Year' if 'Year' in combined_data.columns else 'Period'
+        for key_col in ('Partner_Code', period_col):
+            if combined_data[key_col].dtype == np.int64:
+                combined_data[key_col] = combined_data[key_col].astype(np.int32)
+
         # Determine the actual metric column in the data
         # BACI has Trade_Value_USD and Quantity_MT
         # COMTRADE has Metric_Value
@@ -1997,45 +2425,46 @@ class TradeAnalyzer:
             print("ALL PARTNERS ANALYSIS")
             print(f"{'='*60}")
 
-            # Aggregate totals using actual metric column
-            partner_totals = combined_data.groupby(['Partner_Code', 'Partner_Name']).agg({
-                actual_metric_col: 'sum'
-            }).reset_index()
+            # Aggregate totals using actual metric column, once for the summary, zero check and chart
+            partner_totals = self.partner_metric_totals(combined_data, actual_metric_col)
 
             # Calculate World total
-            world_total = partner_totals[partner_totals['Partner_Code'] != 0][actual_metric_col].sum()
+            world_total = partner_totals[actual_metric_col].sum()
 
-            print(f"\nTotal Trading Partners: {len(partner_totals[partner_totals['Partner_Code'] != 0])}")
+            print(f"\nTotal Trading Partners: {len(partner_totals)}")
             print(f"World Total ({metric_name}): ", end='')
             if metric_type == 'value':
                 print(f"${world_total:,.2f}")
             else:
                 print(f"{world_total:,.2f}")
 
+            # Nothing to rank, chart or export when every partner total is zero
+            if world_total == 0:
+                print(f"\n⚠ No non-zero trade recorded for this selection ({metric_name})")
+                return True
+
             # Display top 10 partners in terminal
             print(f"\n{'-'*60}")
             print(f"TOP 10 TRADING PARTNERS (by {metric_name}):")
             print(f"{'-'*60}")
 
-            top_10 = partner_totals[partner_totals['Partner_Code'] != 0].nlargest(10, actual_metric_col)
+            # Ties ordered by partner code, matching the chart and the exported CSV
+            top_10 = partner_totals.nlargest(10, actual_metric_col).sort_values(
+                [actual_metric_col, 'Partner_Code'], ascending=[False, True])
 
-            # Create display dataframe
-            display_df = top_10[['Partner_Name', actual_metric_col]].copy()
-
-            # Format values for display
-            if metric_type == 'value':
-                display_df[actual_metric_col] = display_df[actual_metric_col].apply(lambda x: f"${x:,.2f}")
-            else:
-                display_df[actual_metric_col] = display_df[actual_metric_col].apply(lambda x: f"{x:,.2f}")
-
-            # Rename columns for display
-            display_df.columns = ['Partner', metric_name]
+            # Create display dataframe straight from the top 10 columns, with values formatted
+            # and display column names (no copy of the slice to rename)
+            value_fmt = "${:,.2f}".format if metric_type == 'value' else "{:,.2f}".format
+            display_df = pd.DataFrame({
+                'Partner': top_10['Partner_Name'].to_numpy(),
+                metric_name: list(map(value_fmt, top_10[actual_metric_col].to_numpy()))
+            })
 
             print(display_df.to_string(index=False))
             print(f"{'-'*60}")
 
             # Detect zero values
-            zero_values = self.detect_zero_values(combined_data, actual_metric_col)
+            zero_values = self.detect_zero_values(combined_data, actual_metric_col, partner_totals)
             if zero_values is not None and len(zero_values) > 0:
                 print(f"\n{'='*60}")
                 print("DATA QUALITY WARNING")
@@ -2056,7 +2485,7 @@ class TradeAnalyzer:
 
             # Create visualization
             self.create_bar_chart(combined_data, actual_metric_col, metric_name, metric_type,
-                                 reporter_name, product_desc, flow_desc, source_info)
+                                 reporter_name, product_desc, flow_desc, source_info, partner_totals)
 
         else:
             # Specific partner analysis
@@ -2064,16 +2493,17 @@ class TradeAnalyzer:
             print(f"SPECIFIC PARTNER ANALYSIS: {partner_name}")
             print(f"{'='*60}")
 
-            # Filter for specific partner
-            partner_data = combined_data[combined_data['Partner_Name'] == partner_name]
+            # Partner rows, computed once and reused by the period totals and the summary
+            partner_mask = (combined_data['Partner_Name'] == partner_name).to_numpy()
 
-            if len(partner_data) == 0:
+            if not partner_mask.any():
                 print(f"\n✗ No data found for {partner_name}")
                 return
 
-            # Calculate totals
-            total_partner = partner_data[actual_metric_col].sum()
-            total_world = combined_data[actual_metric_col].sum()
+            # Calculate totals from the one metric column array (nansum skips NaN like Series.sum)
+            metric_values = combined_data[actual_metric_col].to_numpy()
+            total_partner = np.nansum(metric_values[partner_mask])
+            total_world = np.nansum(metric_values)
             share = (total_partner / total_world * 100) if total_world > 0 else 0
 
             print(f"\nPartner Total ({metric_name}): ", end='')
@@ -2090,62 +2520,56 @@ class TradeAnalyzer:
 
             print(f"Partner Share: {share:.2f}%")
 
+            # Nothing to break down by period, chart or export when the world total is zero
+            if total_world == 0:
+                print(f"\n⚠ No non-zero trade recorded for this selection ({metric_name})")
+                return True
+
+            # Aggregate every metric by period once; the chart and exports below reuse it,
+            # along with its sorted period index
+            metric_cols = self.available_metric_columns(combined_data)
+            period_totals = self.partner_period_totals(combined_data, partner_name, metric_cols, partner_mask)
+            partner_by_period = period_totals[0][actual_metric_col]
+            world_by_period = period_totals[1][actual_metric_col]
+
             # Display recent periods in terminal
-            period_col = 'Year' if 'Year' in combined_data.columns else 'Period'
-            periods = sorted(combined_data[period_col].unique())[-10:]
-            recent_data = combined_data[combined_data[period_col].isin(periods)]
+            periods = world_by_period.index[-10:]
 
             print(f"\n{'-'*60}")
             print(f"RECENT {len(periods)} PERIODS - PARTNER PERFORMANCE:")
             print(f"{'-'*60}")
 
-            # Aggregate by period
-            partner_by_period = recent_data[recent_data['Partner_Name'] == partner_name].groupby(period_col)[actual_metric_col].sum()
-            world_by_period = recent_data.groupby(period_col)[actual_metric_col].sum()
-
-            # Create display dataframe
-            display_data = []
-            for period in periods:
-                partner_val = partner_by_period.get(period, 0)
-                world_val = world_by_period.get(period, 0)
-                share_pct = (partner_val / world_val * 100) if world_val > 0 else 0
-
-                if metric_type == 'value':
-                    partner_str = f"${partner_val:,.2f}"
-                    world_str = f"${world_val:,.2f}"
-                else:
-                    partner_str = f"{partner_val:,.2f}"
-                    world_str = f"{world_val:,.2f}"
-
-                display_data.append({
-                    period_col: period,
-                    f'{partner_name}': partner_str,
-                    'World Total': world_str,
-                    'Share %': f"{share_pct:.2f}%"
-                })
-
-            display_df = pd.DataFrame(display_data)
+            # Create display dataframe (numeric until the final format step)
+            partner_vals = partner_by_period.loc[periods].to_numpy()
+            world_vals = world_by_period.loc[periods].to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                share_pcts = np.where(world_vals > 0, partner_vals / world_vals * 100, 0)
+
+            value_fmt = "${:,.2f}".format if metric_type == 'value' else "{:,.2f}".format
+            display_df = pd.DataFrame({
+                period_col: periods,
+                f'{partner_name}': list(map(value_fmt, partner_vals)),
+                'World Total': list(map(value_fmt, world_vals)),
+                'Share %': list(map("{:.2f}%".format, share_pcts))
+            })
             print(display_df.to_string(index=False))
             print(f"{'-'*60}")
 
             # Create visualization
             self.create_stacked_bar_chart(combined_data, partner_name, actual_metric_col, metric_name, metric_type,
-                                          reporter_name, product_desc, flow_desc, source_info)
+                                          reporter_name, product_desc, flow_desc, source_info, period_totals)
 
             # Export specific partner year-by-year data with share
             self.export_specific_partner_results(combined_data, partner_name, actual_metric_col, metric_name, metric_type,
-                                                  reporter_name, product_desc, flow_desc, source_info)
+                                                  reporter_name, product_desc, flow_desc, source_info, period_totals)
 
             # Subcategory analysis for specific partner
             print(f"\n{'='*60}")
             print("SUBCATEGORY ANALYSIS")
             print(f"{'='*60}")
 
-            # Determine subcategory metric column
-            if data_source == 'BACI':
-                sub_metric_col = metric_name
-            else:
-                sub_metric_col = 'Metric_Value'
+            # Subcategory data uses the same metric column as the partner data
+            sub_metric_col = actual_metric_col
 
             # Use subcategory data from the selected source
             if data_subcategories is not None and len(data_subcategories) > 0:
@@ -2159,20 +2583,15 @@ class TradeAnalyzer:
                     print(f"\nTop 10 Product Subcategories (by {metric_name}):")
                     print(f"{'-'*60}")
 
-                    # Display in terminal
-                    display_df = display_top_10[['Product_Code', 'Product_Desc', sub_metric_col]].copy()
-
-                    # Format values
-                    if metric_type == 'value':
-                        display_df[sub_metric_col] = display_df[sub_metric_col].apply(lambda x: f"${x:,.2f}")
-                    else:
-                        display_df[sub_metric_col] = display_df[sub_metric_col].apply(lambda x: f"{x:,.2f}")
-
-                    # Rename for display
-                    display_df.columns = ['Code', 'Description', metric_name]
-
-                    # Truncate long descriptions for terminal
-                    display_df['Description'] = display_df['Description'].apply(lambda x: str(x)[:50] + "..." if len(str(x)) > 50 else str(x))
+                    # Display in terminal: formatted values, long descriptions truncated
+                    value_fmt = "${:,.2f}".format if metric_type == 'value' else "{:,.2f}".format
+                    descriptions = display_top_10['Product_Desc'].astype(str).astype('string[pyarrow]')
+                    display_df = pd.DataFrame({
+                        'Code': display_top_10['Product_Code'].to_numpy(),
+                        'Description': (descriptions.str.slice(0, 50)
+                                        + np.where(descriptions.str.len() > 50, "...", "")).to_numpy(),
+                        metric_name: list(map(value_fmt, display_top_10[sub_metric_col].to_numpy()))
+                    })
 
                     print(display_df.to_string(index=False))
                     print(f"{'-'*60}")
@@ -2187,37 +2606,64 @@ class TradeAnalyzer:
 
                     # Export consolidated summary TXT file with all terminal output
                     self.export_consolidated_summary(combined_data, top_subcategories, partner_name, actual_metric_col, metric_name, metric_type,
-                                                    reporter_name, product_desc, flow_desc, source_info)
+                                                    reporter_name, product_desc, flow_desc, source_info, period_totals,
+                                                    partner_mask=partner_mask)
                 else:
                     print("\n⚠ No subcategory data available for analysis")
                     # Export summary without subcategory data
                     self.export_consolidated_summary(combined_data, None, partner_name, actual_metric_col, metric_name, metric_type,
-                                                    reporter_name, product_desc, flow_desc, source_info)
+                                                    reporter_name, product_desc, flow_desc, source_info, period_totals,
+                                                    partner_mask=partner_mask)
             else:
                 print("\n⚠ No subcategory data could be loaded")
                 # Export summary without subcategory data
                 self.export_consolidated_summary(combined_data, None, partner_name, actual_metric_col, metric_name, metric_type,
-                                                reporter_name, product_desc, flow_desc, source_info)
-
-        print(f"\n{'='*60}")
-        print("ANALYSIS COMPLETE")
-        print(f"{'='*60}\n")
-
-        # Ask if user wants another analysis
-        print("Run another analysis?")
-        print("  Y  or  Yes  :  Start a new analysis")
-        print("  N  or  No   :  Exit the program")
-        print("")
-        another = input("Enter choice: ").strip().upper()
-        if another in ['Y', 'YES']:
-            print("\n" * 2)
-            self.run()
+                                                reporter_name, product_desc, flow_desc, source_info, period_totals,
+                                                partner_mask=partner_mask)
+
+        return True
+
+
+def parse_args(argv=None):
+    """Parse command-line options; with none given the analyzer runs interactively"""
+    parser = argparse.ArgumentParser(
+        description="International trade data analysis (BACI / COMTRADE). "
+                    "Run without options for the interactive prompts.")
+    parser.add_argument("--period", help="Year(s) YYYY or YYYY-YYYY, month(s) YYYYMM or YYYYMM-YYYYMM")
+    parser.add_argument("--reporter", help="Reporter country name or numeric code")
+    parser.add_argument("--product", help="HS product code, or TOTAL/AG2/AG4/AG6")
+    parser.add_argument("--direction", help="M (Imports) or X (Exports)")
+    # Batch-only options default to None here so that giving one without a batch run can be reported
+    parser.add_argument("--frequency", help="A (Annual, default) or M (Monthly)")
+    parser.add_argument("--source", help="B (BACI) or C (COMTRADE); defaults to BACI for annual data")
+    parser.add_argument("--partner", help="'all' (default), or a partner country name or code")
+    parser.add_argument("--metric", help="BACI: V or Q (default V); COMTRADE: metric number or code (default PV)")
+    args = parser.parse_args(argv)
+
+    required = [args.period, args.reporter, args.product, args.direction]
+    if any(required) and not all(required):
+        parser.error("--period, --reporter, --product and --direction are all required for a batch run")
+    if not any(required) and any(opt is not None for opt in [args.frequency, args.source, args.partner, args.metric]):
+        parser.error("--frequency, --source, --partner and --metric only apply to a batch run "
+                     "(with --period, --reporter, --product and --direction)")
+
+    if args.frequency is None:
+        args.frequency = "A"
+    if args.partner is None:
+        args.partner = "all"
+    return args
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    config = None
+    if args.period:
+        config = RunConfig(period=args.period, reporter=args.reporter, product=args.product,
+                           direction=args.direction, frequency=args.frequency, source=args.source,
+                           partner=args.partner, metric=args.metric)
     try:
         analyzer = TradeAnalyzer()
-        analyzer.run()
+        analyzer.run(config)
     except KeyboardInterrupt:
         print("\n\nAnalysis cancelled by user.")
     except Exception as e: